@@ -1,11 +1,196 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
+from nltk.stem import porter
 from rouge_score import rouge_scorer
+from rouge_score import tokenize as rouge_tokenize
+from rouge_score.scoring import Score, fmeasure
+from helper.tracing import span
 
-def evaluate_summary(summary: str, chunks: list[str]):
-        synthetic_ref = " ".join([doc.page_content for doc in chunks])
-        scorer = rouge_scorer.RougeScorer(["rouge1", "rouge2", "rougeL"], use_stemmer=True)
-        scores = scorer.score(synthetic_ref, summary)
+
+logger = logging.getLogger("DocumentAssistant")
+
+ROUGE_TYPES = ["rouge1", "rouge2", "rougeL"]
+# longest chunk overlap looked for when stitching consecutive chunks back together
+MAX_OVERLAP_CHARS = 4000
+OVERLAP_PROBE_CHARS = 64
+
+_background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rouge")
+
+
+class _CachedStemmer:
+    # Porter stemming dominates rouge_score's tokenizer on long texts; each distinct word is stemmed once
+    def __init__(self):
+        self._stemmer = porter.PorterStemmer()
+        self.stem = lru_cache(maxsize=200_000)(self._stemmer.stem)
+
+
+_stemmer = _CachedStemmer()
+
+
+def _overlap(previous, text):
+    # length of the longest suffix of previous that text starts with (the splitter's chunk overlap)
+    probe = text[:OVERLAP_PROBE_CHARS]
+    if not probe:
+        return 0
+    start = max(0, len(previous) - MAX_OVERLAP_CHARS)
+    position = previous.find(probe, start)
+    while position != -1:
+        if text.startswith(previous[position:]):
+            return len(previous) - position
+        position = previous.find(probe, position + 1)
+    return 0
+
+
+def deduplicated_reference(chunks):
+    # joins chunk texts in order, dropping the text a chunk repeats from the previous chunk of the same page
+    parts = []
+    previous, previous_key = "", None
+    for chunk in chunks:
+        text = getattr(chunk, "page_content", chunk)
+        metadata = getattr(chunk, "metadata", {}) or {}
+        key = (metadata.get("source"), metadata.get("page"))
+        overlap = _overlap(previous, text) if key == previous_key else 0
+        parts.append(text[overlap:])
+        previous, previous_key = text, key
+    return " ".join(parts)
+
+
+def _token_ids(reference_tokens, summary_tokens):
+    vocabulary = {}
+    reference = np.fromiter((vocabulary.setdefault(t, len(vocabulary)) for t in reference_tokens), dtype=np.int64, count=len(reference_tokens))
+    summary = np.fromiter((vocabulary.setdefault(t, len(vocabulary)) for t in summary_tokens), dtype=np.int64, count=len(summary_tokens))
+    return reference, summary, max(len(vocabulary), 1)
+
+
+def _ngrams(ids, n, vocabulary_size):
+    # each n-gram becomes one integer key, so counting is a single np.unique
+    if len(ids) < n:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    keys = ids[: len(ids) - n + 1].copy()
+    for offset in range(1, n):
+        keys = keys * vocabulary_size + ids[offset: len(ids) - n + 1 + offset]
+    return np.unique(keys, return_counts=True)
+
+
+def _score_ngrams(reference, summary, n, vocabulary_size):
+    ref_keys, ref_counts = _ngrams(reference, n, vocabulary_size)
+    sum_keys, sum_counts = _ngrams(summary, n, vocabulary_size)
+    _, ref_index, sum_index = np.intersect1d(ref_keys, sum_keys, assume_unique=True, return_indices=True)
+    overlap = int(np.minimum(ref_counts[ref_index], sum_counts[sum_index]).sum())
+    precision = overlap / max(int(sum_counts.sum()), 1)
+    recall = overlap / max(int(ref_counts.sum()), 1)
+    return Score(precision=precision, recall=recall, fmeasure=fmeasure(precision, recall))
+
+
+def lcs_length(reference, summary):
+    # bit-parallel LCS (Allison-Dix / Hyyro): one big-integer step per reference token, bits index the
+    # summary, so it is exact but linear in the reference instead of a reference x summary table
+    if len(reference) == 0 or len(summary) == 0:
+        return 0
+    masks = {}
+    for i, token in enumerate(summary.tolist()):
+        masks[token] = masks.get(token, 0) | (1 << i)
+    full = (1 << len(summary)) - 1
+    row = full
+    for token in reference.tolist():
+        match = masks.get(token)
+        if match is None:
+            continue
+        matched = row & match
+        row = ((row + matched) | (row - matched)) & full
+    return len(summary) - bin(row).count("1")
+
+
+def _score_lcs(reference, summary):
+    if len(reference) == 0 or len(summary) == 0:
+        return Score(precision=0, recall=0, fmeasure=0)
+    lcs = lcs_length(reference, summary)
+    precision = lcs / len(summary)
+    recall = lcs / len(reference)
+    return Score(precision=precision, recall=recall, fmeasure=fmeasure(precision, recall))
+
+
+def fast_rouge(summary, reference):
+    reference_tokens = rouge_tokenize.tokenize(reference, _stemmer)
+    summary_tokens = rouge_tokenize.tokenize(summary, _stemmer)
+    reference_ids, summary_ids, vocabulary_size = _token_ids(reference_tokens, summary_tokens)
+    return {
+        "rouge1": _score_ngrams(reference_ids, summary_ids, 1, vocabulary_size),
+        "rouge2": _score_ngrams(reference_ids, summary_ids, 2, vocabulary_size),
+        "rougeL": _score_lcs(reference_ids, summary_ids),
+    }
+
+
+def select_representative(vectors, budget, iterations=25, seed=0):
+    # Extractive pre-selection: spherical k-means (k-means++ seeding) over the chunk embeddings, keeping
+    # from each cluster the chunk closest to its centroid. Overlapping neighbours land in the same
+    # cluster, so each topic of the document is sent to the LLM once. Returns indices in document order
+    vectors = np.asarray(vectors, dtype=np.float32)
+    count = len(vectors)
+    if count <= budget:
+        return list(range(count))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    points = vectors / np.where(norms == 0, 1, norms)
+
+    rng = np.random.default_rng(seed)
+    centers = [int(rng.integers(count))]
+    distance = 1 - points @ points[centers[0]]
+    for _ in range(1, budget):
+        weights = np.maximum(distance, 0) ** 2
+        total = weights.sum()
+        center = int(rng.choice(count, p=weights / total)) if total > 0 else int(np.argmax(distance))
+        centers.append(center)
+        distance = np.minimum(distance, 1 - points @ points[center])
+
+    centroids = points[centers]
+    for _ in range(iterations):
+        labels = np.argmax(points @ centroids.T, axis=1)
+        assignment = (labels[:, None] == np.arange(budget)).astype(np.float32)
+        sums = assignment.T @ points
+        # an empty cluster keeps its previous centroid
+        sums = np.where(np.bincount(labels, minlength=budget)[:, None] > 0, sums, centroids)
+        updated = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+        if np.allclose(updated, centroids, atol=1e-6):
+            break
+        centroids = updated
+
+    similarity = points @ centroids.T
+    labels = np.argmax(similarity, axis=1)
+    # per cluster, the member most similar to the centroid: mask out other clusters, then argmax per column
+    own = np.where(labels[:, None] == np.arange(budget), similarity, -np.inf)
+    members = np.bincount(labels, minlength=budget) > 0
+    return sorted(set(np.argmax(own, axis=0)[members].tolist()))
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Summary evaluation failed", exc_info=future.exception())
+
+
+def evaluate_summary(summary: str, chunks: list[str], mode: str = "fast", background: bool = False):
+        # mode="fast": overlap-free reference, cached stemming, vectorized n-gram counts and exact
+        # bit-parallel ROUGE-L; mode="exact": the original rouge_scorer over all chunk text.
+        # background=True returns a Future so the caller can show the summary without waiting;
+        # the scores are also recorded on the evaluate_summary span
+        if background:
+            future = _background.submit(evaluate_summary, summary, chunks, mode)
+            future.add_done_callback(_log_failure)
+            return future
+
+        with span("evaluate_summary", mode=mode, chunks=len(chunks)) as attrs:
+            if mode == "exact":
+                synthetic_ref = " ".join([doc.page_content for doc in chunks])
+                scorer = rouge_scorer.RougeScorer(ROUGE_TYPES, use_stemmer=True)
+                scores = scorer.score(synthetic_ref, summary)
+            else:
+                synthetic_ref = deduplicated_reference(chunks)
+                scores = fast_rouge(summary, synthetic_ref)
+            attrs["bytes"] = len(synthetic_ref.encode("utf-8"))
+            attrs.update({f"{key}_f1": round(val.fmeasure, 4) for key, val in scores.items()})
 
         print("\n📊 ROUGE SCORE:")
         for key, val in scores.items():
             print(f"{key}: P={val.precision:.3f}, R={val.recall:.3f}, F1={val.fmeasure:.3f}")
-        return scores
\ No newline at end of file
+        return scores
@@ -1,18 +1,97 @@
 
 import docx
 import fitz  # PyMuPDF
+import openpyxl
 import pandas as pd
+import json
 import os
-from typing import Optional
-from deep_translator import GoogleTranslator
+import re
+import shutil
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Optional
+from actions.translation_engine import GoogleBackend, TranslationBackend, TranslationEngine
+from actions.translation_memory import TranslationMemory, get_translation_memory
+from helper.config import settings
+from helper.tracing import span
+
+
+logger = logging.getLogger("DocumentAssistant")
+
+PDF_CSS = "* {font-family: sans-serif;}"
+# rows read, translated and written per batch, so CSV/XLSX memory stays flat however large the file is
+TABLE_BATCH_ROWS = 5000
+
+
+def _render_pdf_pages(file_path, first_page, last_page, placements, part_path):
+    # runs in a worker process: redraw pages [first_page, last_page] and save them as one part
+    doc = fitz.open(file_path)
+    doc.select(list(range(first_page, last_page + 1)))
+    WHITE = fitz.pdfcolor["white"]
+    ocg_xref = doc.add_ocg("Translated", on=True)
+    for page_number, bbox, text in placements:
+        page = doc[page_number - first_page]
+        page.draw_rect(bbox, color=None, fill=WHITE, oc=ocg_xref)
+        page.insert_htmlbox(bbox, text, css=PDF_CSS, oc=ocg_xref)
+    doc.subset_fonts()
+    # write to a temporary name first so an interrupted run never leaves a half-written part
+    doc.ez_save(part_path + ".tmp")
+    doc.close()
+    os.replace(part_path + ".tmp", part_path)
+    return first_page, last_page
+
+
+def _register_layers(doc):
+    # insert_pdf copies each part's own "Translated" layer but not the catalog's layer list. Point every
+    # page at a single layer of the merged document instead, so viewers list it once and it toggles all
+    # pages; the parts' layers are then unreferenced and dropped by ez_save's garbage collection
+    layer = None
+    for page in doc:
+        kind, value = doc.xref_get_key(page.xref, "Resources/Properties")
+        if kind == "null":
+            continue
+        properties_xref = int(value.split()[0]) if kind == "xref" else None
+        properties = doc.xref_object(properties_xref) if properties_xref else value
+        for name, xref in re.findall(r"/([^\s/<>\[\]()]+)\s+(\d+) 0 R", properties):
+            if doc.xref_get_key(int(xref), "Type") != ("name", "/OCG"):
+                continue
+            if layer is None:
+                layer = doc.add_ocg("Translated", on=True)
+            if properties_xref:
+                doc.xref_set_key(properties_xref, name, f"{layer} 0 R")
+            else:
+                doc.xref_set_key(page.xref, f"Resources/Properties/{name}", f"{layer} 0 R")
+
 
 class StructuredFileTranslator:
-    def __init__(self, file_path: str, source_lang: str = "auto", target_lang: str = "en"):
+    def __init__(
+        self,
+        file_path: str,
+        source_lang: str = "auto",
+        target_lang: str = "en",
+        backend: Optional[TranslationBackend] = None,
+        max_workers: int = 4,
+        memory: Optional[TranslationMemory] = None,
+        pdf_workers: Optional[int] = None,
+        pages_per_part: int = 10,
+        progress: Optional[Callable[[int, int], None]] = None,
+        batch_rows: int = TABLE_BATCH_ROWS,
+    ):
         self.file_path = file_path
         self.source_lang = source_lang
         self.target_lang = target_lang
         self.file_type = self._detect_file_type()
-        self.translator = GoogleTranslator(source=self.source_lang, target=self.target_lang)
+        self.engine = TranslationEngine(
+            backend or GoogleBackend(self.source_lang, self.target_lang),
+            memory=memory if memory is not None else get_translation_memory(),
+            source_lang=self.source_lang,
+            target_lang=self.target_lang,
+            max_workers=max_workers,
+        )
+        self.pdf_workers = pdf_workers or settings.translate_pdf_workers
+        self.pages_per_part = pages_per_part
+        self.progress = progress
+        self.batch_rows = batch_rows
 
     def _detect_file_type(self):
         ext = os.path.splitext(self.file_path)[-1].lower()
@@ -25,6 +104,10 @@ class StructuredFileTranslator:
         }.get(ext, None)
 
     def translate(self) -> Optional[str]:
+        with span("translate.file", file_type=self.file_type, bytes=os.path.getsize(self.file_path)):
+            return self._translate_file()
+
+    def _translate_file(self):
         if self.file_type == "application/pdf":
             return self._translate_pdf()
         elif self.file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
@@ -40,58 +123,176 @@ class StructuredFileTranslator:
 
     def _translate_text(self):
         out_path = self.file_path.replace(".txt", f"_translated_{self.target_lang}.txt")
-        with open(self.file_path, "r", encoding="utf-8") as infile, open(out_path, "w", encoding="utf-8") as outfile:
-            for line in infile:
-                translated = self.translator.translate(line.strip())
-                outfile.write(translated + "\n")
+        with open(self.file_path, "r", encoding="utf-8") as infile:
+            lines = [line.strip() for line in infile]
+        translated = self.engine.translate(lines, progress=self._segment_progress)
+        with open(out_path, "w", encoding="utf-8") as outfile:
+            for line in translated:
+                outfile.write(line + "\n")
         return out_path
 
+    def _translate_frame(self, df, progress=None):
+        # every text column of the batch goes to the engine in one call, so they share backend batches
+        columns = [col for col in df.columns if df[col].dtype == object]
+        values = [value for col in columns for value in df[col].astype(str).tolist()]
+        translated = self.engine.translate(values, progress=progress)
+        for n, col in enumerate(columns):
+            df[col] = translated[n * len(df):(n + 1) * len(df)]
+        return df
+
     def _translate_csv(self):
-        df = pd.read_csv(self.file_path)
-        for col in df.columns:
-            if df[col].dtype == object:
-                df[col] = df[col].astype(str).apply(lambda x: self.translator.translate(x) if x.strip() else x)
+        # read and translate batch_rows rows at a time, appending each batch to the output
         out_path = self.file_path.replace(".csv", f"_translated_{self.target_lang}.csv")
-        df.to_csv(out_path, index=False)
+        total_bytes = os.path.getsize(self.file_path)
+        done_bytes = 0
+        with open(self.file_path, "rb") as infile, open(out_path + ".tmp", "w", encoding="utf-8", newline="") as outfile:
+            for i, df in enumerate(pd.read_csv(infile, chunksize=self.batch_rows)):
+                read_bytes = max(done_bytes, min(infile.tell(), total_bytes))
+                progress = self._range_progress(done_bytes, read_bytes, total_bytes, "bytes")
+                self._translate_frame(df, progress).to_csv(outfile, index=False, header=i == 0)
+                done_bytes = read_bytes
+                self._report_progress(done_bytes, total_bytes, "bytes")
+        os.replace(out_path + ".tmp", out_path)
         return out_path
 
     def _translate_excel(self):
-        df = pd.read_excel(self.file_path, sheet_name=None)
+        # read-only workbooks stream rows from the file and write-only ones stream them out,
+        # so neither side holds a whole sheet; text cells are translated batch_rows rows at a time
         output_path = self.file_path.replace(".xlsx", f"_translated_{self.target_lang}.xlsx")
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            for sheet_name, sheet_data in df.items():
-                for col in sheet_data.columns:
-                    if sheet_data[col].dtype == object:
-                        sheet_data[col] = sheet_data[col].astype(str).apply(lambda x: self.translator.translate(x) if x.strip() else x)
-                sheet_data.to_excel(writer, sheet_name=sheet_name, index=False)
+        source = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True)
+        target = openpyxl.Workbook(write_only=True)
+        try:
+            total_rows = sum(sheet.max_row or 0 for sheet in source.worksheets)
+            done_rows = 0
+            for sheet in source.worksheets:
+                out_sheet = target.create_sheet(title=sheet.title)
+                rows = sheet.iter_rows(values_only=True)
+                # the header row holds column names, which were never translated
+                header = next(rows, None)
+                if header is not None:
+                    out_sheet.append(header)
+                    done_rows += 1
+                batch = []
+                for row in rows:
+                    batch.append(list(row))
+                    if len(batch) >= self.batch_rows:
+                        self._write_rows(out_sheet, batch, self._range_progress(done_rows, done_rows + len(batch), total_rows, "rows"))
+                        done_rows += len(batch)
+                        self._report_progress(done_rows, total_rows, "rows")
+                        batch = []
+                if batch:
+                    self._write_rows(out_sheet, batch, self._range_progress(done_rows, done_rows + len(batch), total_rows, "rows"))
+                    done_rows += len(batch)
+                    self._report_progress(done_rows, total_rows, "rows")
+            target.save(output_path + ".tmp")
+        finally:
+            source.close()
+        os.replace(output_path + ".tmp", output_path)
         return output_path
 
+    def _write_rows(self, sheet, rows, progress=None):
+        cells = [(r, c) for r, row in enumerate(rows) for c, value in enumerate(row) if isinstance(value, str)]
+        translated = self.engine.translate([rows[r][c] for r, c in cells], progress=progress)
+        for (r, c), text in zip(cells, translated):
+            rows[r][c] = text
+        for row in rows:
+            sheet.append(row)
+
     def _translate_docx(self):
         doc = docx.Document(self.file_path)
-        for para in doc.paragraphs:
-            if para.text.strip():
-                para.text = self.translator.translate(para.text)
+        paragraphs = [para for para in doc.paragraphs if para.text.strip()]
+        translated = self.engine.translate([para.text for para in paragraphs], progress=self._segment_progress)
+        for para, text in zip(paragraphs, translated):
+            para.text = text
         out_path = self.file_path.replace(".docx", f"_translated_{self.target_lang}.docx")
         doc.save(out_path)
         return out_path
 
     def _translate_pdf(self):
-        doc = fitz.open(self.file_path)
         out_path = self.file_path.replace(".pdf", f"_translated_{self.target_lang}.pdf")
-        WHITE = fitz.pdfcolor["white"]
         textflags = fitz.TEXT_DEHYPHENATE
-        ocg_xref = doc.add_ocg("Translated", on=True)
-
-        for page in doc:
-            blocks = page.get_text("blocks", flags=textflags)
-            for block in blocks:
-                bbox, text = block[:4], block[4].strip()
-                if not text:
-                    continue
-                translated = self.translator.translate(text)
-                page.draw_rect(bbox, color=None, fill=WHITE, oc=ocg_xref)
-                page.insert_htmlbox(bbox, translated, css="* {font-family: sans-serif;}", oc=ocg_xref)
-
-        doc.subset_fonts()
-        doc.ez_save(out_path)
+
+        # collect the blocks of every page first so they are translated in shared batches
+        placements = []
+        with fitz.open(self.file_path) as doc:
+            page_count = doc.page_count
+            for page in doc:
+                blocks = page.get_text("blocks", flags=textflags)
+                for block in blocks:
+                    bbox, text = tuple(block[:4]), block[4].strip()
+                    if text:
+                        placements.append((page.number, bbox, text))
+
+        translated = self.engine.translate([text for _, _, text in placements], progress=self._segment_progress)
+        placements = [(page_number, bbox, text) for (page_number, bbox, _), text in zip(placements, translated)]
+
+        # redraw page ranges as separate parts; parts left by an earlier, interrupted run are reused
+        # when they were rendered from the same file with the same part size
+        parts_dir = out_path + ".parts"
+        self._prepare_parts_dir(parts_dir)
+        ranges = [
+            (first, min(first + self.pages_per_part, page_count) - 1)
+            for first in range(0, page_count, self.pages_per_part)
+        ]
+        part_paths = {first: os.path.join(parts_dir, f"{first:06d}-{last:06d}.pdf") for first, last in ranges}
+        todo = [(first, last) for first, last in ranges if not os.path.exists(part_paths[first])]
+        done_pages = page_count - sum(last - first + 1 for first, last in todo)
+        if done_pages:
+            logger.info(f"Resuming PDF translation: {done_pages}/{page_count} pages already rendered")
+        self._report_progress(done_pages, page_count, "pages")
+
+        def jobs():
+            for first, last in todo:
+                yield first, last, [p for p in placements if first <= p[0] <= last], part_paths[first]
+
+        if self.pdf_workers > 1 and len(todo) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.pdf_workers, len(todo))) as pool:
+                futures = [pool.submit(_render_pdf_pages, self.file_path, *job) for job in jobs()]
+                for future in as_completed(futures):
+                    first, last = future.result()
+                    done_pages += last - first + 1
+                    self._report_progress(done_pages, page_count, "pages")
+        else:
+            for job in jobs():
+                first, last = _render_pdf_pages(self.file_path, *job)
+                done_pages += last - first + 1
+                self._report_progress(done_pages, page_count, "pages")
+
+        with fitz.open() as merged:
+            for first, _ in ranges:
+                with fitz.open(part_paths[first]) as part:
+                    merged.insert_pdf(part)
+            _register_layers(merged)
+            merged.ez_save(out_path)
+        shutil.rmtree(parts_dir, ignore_errors=True)
         return out_path
+
+    def _prepare_parts_dir(self, parts_dir):
+        from helper.ingest import file_sha256
+
+        source = {"sha256": file_sha256(self.file_path), "pages_per_part": self.pages_per_part}
+        source_path = os.path.join(parts_dir, "source.json")
+        if os.path.isdir(parts_dir):
+            try:
+                with open(source_path, "r", encoding="utf-8") as f:
+                    previous = json.load(f)
+            except (OSError, ValueError):
+                previous = None
+            if previous != source:
+                logger.info("Discarding PDF parts of an earlier run: the source file or part size changed")
+                shutil.rmtree(parts_dir, ignore_errors=True)
+        os.makedirs(parts_dir, exist_ok=True)
+        with open(source_path, "w", encoding="utf-8") as f:
+            json.dump(source, f)
+
+    def _segment_progress(self, done, total):
+        self._report_progress(done, total, "segments")
+
+    def _range_progress(self, start, end, total, unit):
+        # maps the engine's segment progress for one batch onto the [start, end] share of a file-level count
+        return lambda done, segments: self._report_progress(start + (end - start) * done // max(segments, 1), total, unit)
+
+    def _report_progress(self, done, total, unit):
+        logger.info(f"Translation | {os.path.basename(self.file_path)}: {done}/{total} {unit}")
+        if self.progress is not None:
+            self.progress(done, total)
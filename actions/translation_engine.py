@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from deep_translator import GoogleTranslator
+from actions.translation_memory import TranslationMemory, normalize_segment
+from helper.tracing import span
+
+
+logger = logging.getLogger("DocumentAssistant")
+
+
+class TranslationBackend(ABC):
+    # Backends translate a list of segments and must return one result per segment, in order.
+    # translate_batch is called from several engine threads at once
+    max_batch_chars = 4500
+    max_batch_segments = 100
+
+    @abstractmethod
+    def translate_batch(self, segments: list[str]) -> list[str]:
+        ...
+
+    @property
+    def backend_id(self) -> str:
+        # part of the translation memory namespace, so backends never reuse each other's output
+        return type(self).__name__
+
+
+class GoogleBackend(TranslationBackend):
+    def __init__(self, source_lang: str = "auto", target_lang: str = "en"):
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self._local = threading.local()
+
+    @property
+    def translator(self):
+        # GoogleTranslator keeps the text of the request in progress on the instance, so sharing one
+        # between threads can send another batch's text; each thread gets its own
+        translator = getattr(self._local, "translator", None)
+        if translator is None:
+            translator = self._local.translator = GoogleTranslator(source=self.source_lang, target=self.target_lang)
+        return translator
+
+    def translate_batch(self, segments):
+        # send single-line segments as one newline-joined payload, falling back to
+        # per-segment calls whenever the line count does not survive translation
+        if len(segments) > 1 and not any("\n" in segment for segment in segments):
+            translated = self.translator.translate("\n".join(segments))
+            parts = translated.split("\n") if translated else []
+            if len(parts) == len(segments):
+                return [part.strip() for part in parts]
+        return [self.translator.translate(segment) for segment in segments]
+
+
+class IdentityBackend(TranslationBackend):
+    # Offline stand-in for tests and benchmarks: returns segments unchanged (or tagged)
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self.calls = 0
+
+    @property
+    def backend_id(self):
+        return f"{type(self).__name__}({self.prefix})"
+
+    def translate_batch(self, segments):
+        self.calls += 1
+        return [f"{self.prefix}{segment}" for segment in segments]
+
+
+class TranslationEngine:
+    def __init__(
+        self,
+        backend: TranslationBackend,
+        memory: Optional[TranslationMemory] = None,
+        source_lang: str = "auto",
+        target_lang: str = "en",
+        max_workers: int = 4,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+    ):
+        self.backend = backend
+        self.memory = memory
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.memory_namespace = TranslationMemory.namespace(backend.backend_id, source_lang, target_lang)
+
+    def translate(self, segments: list[str], progress: Optional[Callable[[int, int], None]] = None) -> list[str]:
+        # blank segments are passed through untouched, everything else is translated
+        # once per distinct normalized value and written back to its original position.
+        # progress(done, total) counts distinct segments and is called on this thread after each
+        # backend batch; if it raises (a cancelled job), batches that have not started are dropped
+        results = list(segments)
+        pending = [i for i, segment in enumerate(segments) if isinstance(segment, str) and segment.strip()]
+        if not pending:
+            return results
+
+        unique = {}
+        for i in pending:
+            unique.setdefault(normalize_segment(segments[i]), segments[i])
+
+        with span("translate.segments", segments=len(pending), unique=len(unique)) as attrs:
+            known = {}
+            if self.memory is not None:
+                known = self.memory.get_many(self.memory_namespace, list(unique.values()))
+            missing = [segment for segment in unique.values() if segment not in known]
+            attrs.update(cache_hits=len(unique) - len(missing), bytes=sum(len(segment.encode("utf-8")) for segment in missing))
+            if progress is not None:
+                progress(len(known), len(unique))
+            if missing:
+                translated = {}
+                try:
+                    self._translate_unique(missing, translated, progress, len(known), len(unique))
+                finally:
+                    # batches finished before a cancellation are kept for the next run
+                    if self.memory is not None and translated:
+                        self.memory.put_many(self.memory_namespace, translated)
+                known.update(translated)
+
+        for i in pending:
+            segment = unique[normalize_segment(segments[i])]
+            text = known.get(segment)
+            results[i] = text if text is not None else segments[i]
+
+        if self.memory is not None:
+            logger.info(f"Translation memory | {len(pending)} segments, {len(missing)} sent to backend, {self.memory.stats()}")
+        return results
+
+    def _translate_unique(self, segments, translated, progress=None, done=0, total=0):
+        batches = self._make_batches(range(len(segments)), segments)
+        workers = max(1, min(self.max_workers, len(batches)))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            batch_texts = [[segments[i] for i in batch] for batch in batches]
+            for texts, results in zip(batch_texts, pool.map(self._run_batch, batch_texts)):
+                translated.update(zip(texts, results))
+                done += len(texts)
+                if progress is not None:
+                    progress(done, total)
+        finally:
+            pool.shutdown(cancel_futures=True)
+        return translated
+
+    def _make_batches(self, indices, segments):
+        batches, current, current_chars = [], [], 0
+        for i in indices:
+            size = len(segments[i])
+            if current and (
+                current_chars + size > self.backend.max_batch_chars
+                or len(current) >= self.backend.max_batch_segments
+            ):
+                batches.append(current)
+                current, current_chars = [], 0
+            current.append(i)
+            current_chars += size
+        if current:
+            batches.append(current)
+        return batches
+
+    def _run_batch(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                translated = self.backend.translate_batch(batch)
+                if len(translated) != len(batch):
+                    raise ValueError(f"Backend returned {len(translated)} results for {len(batch)} segments")
+                return translated
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"Translation batch failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
@@ -0,0 +1,42 @@
+import os
+import unicodedata
+from functools import lru_cache
+from helper.lru_store import SQLiteLRUStore, text_hash
+
+
+DEFAULT_MEMORY_PATH = os.path.join("data", "translation_memory.sqlite")
+
+
+def normalize_segment(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class TranslationMemory(SQLiteLRUStore):
+    # Persistent segment store keyed by (backend, source lang, target lang, normalized segment) with LRU
+    # eviction. Short cells such as "Gift" or "chat" translate differently per source language, and an
+    # offline backend's output must never be served to real runs, so none of them share entries
+    def __init__(self, path: str = DEFAULT_MEMORY_PATH, max_entries: int = 500_000):
+        super().__init__(path, max_entries, label="Translation memory")
+
+    @staticmethod
+    def namespace(backend_id: str, source_lang: str, target_lang: str) -> str:
+        return f"{backend_id}:{source_lang}>{target_lang}"
+
+    @staticmethod
+    def segment_hash(segment: str) -> str:
+        return text_hash(normalize_segment(segment))
+
+    def get_many(self, namespace: str, segments: list[str]) -> dict[str, str]:
+        hashes = {self.segment_hash(segment): segment for segment in segments}
+        found = super().get_many(namespace, list(hashes))
+        return {hashes[segment_hash]: translation for segment_hash, translation in found.items()}
+
+    def put_many(self, namespace: str, pairs: dict[str, str]):
+        super().put_many(namespace, [
+            (self.segment_hash(segment), translation) for segment, translation in pairs.items() if translation is not None
+        ])
+
+
+@lru_cache(maxsize=None)
+def get_translation_memory(path: str = DEFAULT_MEMORY_PATH, max_entries: int = 500_000) -> TranslationMemory:
+    return TranslationMemory(path=path, max_entries=max_entries)
@@ -0,0 +1,110 @@
+import os
+import random
+import shutil
+
+import docx
+import fitz  # PyMuPDF
+import pandas as pd
+
+
+GIZA_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "The_Plan_of_the_Giza_Pyramids_translated_arabic.pdf")
+
+WORDS = (
+    "pyramid plateau survey cubit measurement alignment axis diagonal base height ratio design "
+    "architect builder stone granite limestone chamber passage corridor temple causeway sphinx "
+    "dynasty pharaoh khufu khafre menkaure egypt nile desert site plan geometry proportion grid "
+    "analysis evidence hypothesis result method sample data table figure reference study"
+).split()
+
+CATEGORIES = ["Granite", "Limestone", "Basalt", "Alabaster", "Mudbrick"]
+UNITS = ["cubits", "metres", "feet"]
+
+SIZES = {
+    "small": {"pages": 5, "paragraphs": 40, "rows": 200},
+    "medium": {"pages": 40, "paragraphs": 300, "rows": 2000},
+    "large": {"pages": 200, "paragraphs": 1500, "rows": 20000},
+}
+
+
+def _sentence(rng, words=14):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _paragraph(rng, sentences=5):
+    return " ".join(_sentence(rng) for _ in range(sentences))
+
+
+def write_txt(path, paragraphs, rng):
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(paragraphs):
+            f.write(_paragraph(rng) + "\n\n")
+
+
+def write_docx(path, paragraphs, rng):
+    document = docx.Document()
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            document.add_heading(_sentence(rng, 4), level=2)
+        document.add_paragraph(_paragraph(rng))
+    document.save(path)
+
+
+def write_pdf(path, pages, rng):
+    document = fitz.open()
+    for _ in range(pages):
+        page = document.new_page()
+        y = 72
+        for _ in range(6):
+            rect = fitz.Rect(72, y, page.rect.width - 72, y + 110)
+            page.insert_textbox(rect, _paragraph(rng, 4), fontsize=10)
+            y += 120
+    document.save(path)
+
+
+def _table(rows, rng):
+    # lots of repeated categorical values, like real exports
+    return pd.DataFrame({
+        "id": range(rows),
+        "material": [rng.choice(CATEGORIES) for _ in range(rows)],
+        "unit": [rng.choice(UNITS) for _ in range(rows)],
+        "value": [round(rng.uniform(1, 500), 2) for _ in range(rows)],
+        "note": [_sentence(rng, 6) for _ in range(rows)],
+    })
+
+
+def write_csv(path, rows, rng):
+    _table(rows, rng).to_csv(path, index=False)
+
+
+def write_xlsx(path, rows, rng):
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        _table(rows, rng).to_excel(writer, sheet_name="survey", index=False)
+        _table(max(1, rows // 4), rng).to_excel(writer, sheet_name="summary", index=False)
+
+
+def generate_corpus(directory, size="small", seed=0, include_giza=True):
+    # returns [(file_path, content_type)] for one file of every supported type
+    params = SIZES[size]
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    files = [
+        (os.path.join(directory, f"{size}.txt"), "text/plain", lambda p: write_txt(p, params["paragraphs"], rng)),
+        (os.path.join(directory, f"{size}.pdf"), "application/pdf", lambda p: write_pdf(p, params["pages"], rng)),
+        (os.path.join(directory, f"{size}.docx"), "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+         lambda p: write_docx(p, params["paragraphs"], rng)),
+        (os.path.join(directory, f"{size}.csv"), "text/csv", lambda p: write_csv(p, params["rows"], rng)),
+        (os.path.join(directory, f"{size}.xlsx"), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+         lambda p: write_xlsx(p, params["rows"], rng)),
+    ]
+    corpus = []
+    for path, content_type, writer in files:
+        if not os.path.exists(path):
+            writer(path)
+        corpus.append((path, content_type))
+
+    if include_giza and os.path.exists(GIZA_PDF):
+        giza_path = os.path.join(directory, "giza.pdf")
+        if not os.path.exists(giza_path):
+            shutil.copy(GIZA_PDF, giza_path)
+        corpus.append((giza_path, "application/pdf"))
+    return corpus
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def fake_vector(text, dim=256):
+    # deterministic unit vector seeded by the text, so runs are reproducible
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class HashEmbeddings(Embeddings):
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        return [fake_vector(text, self.dim) for text in texts]
+
+    def embed_query(self, text):
+        return fake_vector(text, self.dim)
+
+
+def fake_completion(messages):
+    # echo the first words of the last message so outputs are deterministic and sized like real answers
+    words = messages[-1]["content"].split()
+    answer = "Summary: " + " ".join(words[:60])
+    prompt_tokens = sum(len(message["content"].split()) for message in messages)
+    return answer, prompt_tokens, len(answer.split())
+
+
+class FakeOllamaServer:
+    # Local stand-in for Ollama: OpenAI-compatible /v1/chat/completions plus native /api/embed.
+    # latency and token_delay simulate prefill and generation time
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, token_delay=0.0, dim=256):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.dim = dim
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                if self.path.endswith("/chat/completions"):
+                    server._chat(self, body)
+                elif self.path in ("/api/embed", "/api/embeddings"):
+                    inputs = body.get("input", body.get("prompt", ""))
+                    inputs = [inputs] if isinstance(inputs, str) else inputs
+                    time.sleep(server.latency)
+                    embeddings = [fake_vector(text, server.dim) for text in inputs]
+                    if self.path == "/api/embeddings":
+                        server._json(self, {"embedding": embeddings[0]})
+                    else:
+                        server._json(self, {"model": body.get("model"), "embeddings": embeddings})
+                else:
+                    self.send_error(404)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _json(self, handler, payload):
+        data = json.dumps(payload).encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _chat(self, handler, body):
+        answer, prompt_tokens, completion_tokens = fake_completion(body["messages"])
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        base = {"id": "fake", "created": int(time.time()), "model": body.get("model", "fake")}
+        time.sleep(self.latency)
+
+        if not body.get("stream"):
+            time.sleep(self.token_delay * completion_tokens)
+            self._json(handler, {
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        events = [
+            {**base, "object": "chat.completion.chunk",
+             "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+            for word in answer.split()
+        ]
+        events.append({**base, "object": "chat.completion.chunk",
+                       "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            events.append({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        for event in events:
+            time.sleep(self.token_delay)
+            handler.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            handler.wfile.flush()
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+        handler.close_connection = True
@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+def profile_import(module, runs=3):
+    # runs `python -X importtime -c "import <module>"` in fresh interpreters and keeps the fastest run
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        modules = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+            if self_us.isdigit():
+                modules[name] = {"self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000}
+        if module not in modules:
+            raise RuntimeError(f"Could not import {module}:\n{result.stderr[-2000:]}")
+        if best is None or modules[module]["cumulative_ms"] < best[module]["cumulative_ms"]:
+            best = modules
+    return best
+
+
+def top_level_packages(modules, limit):
+    totals = {}
+    for name, timing in modules.items():
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0.0) + timing["self_ms"]
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report how long importing a module (the Streamlit entry point by default) takes")
+    parser.add_argument("module", nargs="?", default="frontend")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", default=None, help="write the full per-module profile as JSON")
+    args = parser.parse_args()
+
+    modules = profile_import(args.module, args.runs)
+    print(f"import {args.module}: {modules[args.module]['cumulative_ms']:.0f}ms total, {len(modules)} modules loaded\n")
+    print("Slowest top-level packages (self time):")
+    for package, ms in top_level_packages(modules, args.top):
+        print(f"  {package:<28} {ms:8.1f}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"module": args.module, "modules": modules}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import psutil
+
+from benchmarks.corpus import SIZES, generate_corpus
+from benchmarks.fakes import FakeOllamaServer
+
+
+QUESTIONS = [
+    "What is the ratio between the base and the height of the pyramid?",
+    "Which materials were used for the chamber?",
+    "How was the site plan aligned with the Nile?",
+    "What measurement unit does the survey use?",
+]
+
+
+class PeakRSS:
+    # samples the process RSS in the background while a stage runs
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_stage(name, func, inputs, units_of=lambda item, result: 1, unit="items", repeat=1, setup=None):
+    # setup() runs before every call, outside the timed section
+    latencies, units = [], 0
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for item in inputs:
+                if setup is not None:
+                    setup()
+                t = time.perf_counter()
+                result = func(item)
+                latencies.append(time.perf_counter() - t)
+                units += units_of(item, result)
+        elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+    report = {
+        "calls": len(latencies),
+        "latency_ms": {
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p95": float(np.percentile(latencies_ms, 95)),
+            "mean": float(latencies_ms.mean()),
+            "max": float(latencies_ms.max()),
+        },
+        "throughput": units / elapsed if elapsed else None,
+        "unit": f"{unit}/s",
+        "peak_rss_mb": rss.peak / 2 ** 20,
+    }
+    print(f"{name:<16} p50={report['latency_ms']['p50']:9.1f}ms p95={report['latency_ms']['p95']:9.1f}ms "
+          f"throughput={report['throughput']:10.2f} {report['unit']:<12} peak_rss={report['peak_rss_mb']:.0f}MB")
+    return report
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    work_dir = os.path.join(args.work_dir, args.size)
+    corpus = generate_corpus(work_dir, size=args.size, seed=args.seed, include_giza=not args.no_giza)
+
+    with FakeOllamaServer(latency=args.llm_latency, token_delay=args.token_delay) as server:
+        # route every Ollama call (embeddings and chat) to the local fake
+        os.environ["DRX_OLLAMA_BASE_URL"] = server.url
+        import main
+        from actions.summary import evaluate_summary
+        from actions.translate import StructuredFileTranslator
+        from actions.translation_engine import IdentityBackend
+        from actions.translation_memory import TranslationMemory
+        from helper.answer_cache import get_answer_cache
+        from helper.embedding_cache import EmbeddingCache
+        from helper.ingest import IngestionManifest
+        from helper.process_file import ProcessFile
+        from helper.read_file import ReadFile
+        from helper.vector_store import Vectorstore
+
+        stages = {}
+
+        documents = {}
+        def read(item):
+            documents[item[0]] = ReadFile(item[0]).process(item[1])
+            return documents[item[0]]
+        stages["read"] = run_stage("read", read, corpus, unit="files", repeat=args.repeat)
+
+        stages["read_parallel"] = run_stage(
+            "read_parallel", lambda items: list(ReadFile.process_many(items, max_workers=args.workers)),
+            [corpus], units_of=lambda items, _: len(items), unit="files", repeat=args.repeat,
+        )
+
+        chunks = {}
+        def chunk(item):
+            chunks[item[0]] = ProcessFile(documents[item[0]]).process()
+            return chunks[item[0]]
+        stages["chunk"] = run_stage("chunk", chunk, corpus, units_of=lambda _, result: len(result), unit="chunks", repeat=args.repeat)
+
+        all_chunks = [c for path, _ in corpus for c in chunks[path]]
+        cache = EmbeddingCache(":memory:")
+        vectorstores = []
+        def index(cached):
+            if not cached:
+                cache.clear()
+            vectorstores.append(Vectorstore().get_vectorstore(all_chunks, cache=cache))
+            return vectorstores[-1]
+        stages["index"] = run_stage("index", index, [False], units_of=lambda *_: len(all_chunks), unit="chunks", repeat=args.repeat)
+        stages["index_cached"] = run_stage("index_cached", index, [True], units_of=lambda *_: len(all_chunks), unit="chunks", repeat=args.repeat)
+        stages["index_cached"]["embedding_cache"] = cache.stats()
+
+        # upload to ready-to-query, from cold: parse + chunk everything, then index (sequential), versus
+        # feeding the indexing pipeline as each file is parsed (pipelined)
+        uploads = [(path, content_type, None) for path, content_type in corpus]
+        def ingest_to_ready(pipelined):
+            cache.clear()
+            manifest_dir = tempfile.mkdtemp(dir=work_dir)
+            try:
+                manifest = IngestionManifest(manifest_dir)
+                if not pipelined:
+                    ingested = [c for _, data, _ in manifest.ingest_many(uploads, max_workers=args.workers) for c in data]
+                    return Vectorstore().get_vectorstore(ingested, cache=cache)
+                pipeline = Vectorstore().start_pipeline(cache=cache)
+                for _, data, _ in manifest.ingest_many(uploads, max_workers=args.workers):
+                    pipeline.feed(data)
+                return pipeline.finish()
+            finally:
+                shutil.rmtree(manifest_dir, ignore_errors=True)
+        stages["ingest_sequential"] = run_stage("ingest_sequential", ingest_to_ready, [False], units_of=lambda *_: len(corpus), unit="files", repeat=args.repeat)
+        stages["ingest_pipelined"] = run_stage("ingest_pipelined", ingest_to_ready, [True], units_of=lambda *_: len(corpus), unit="files", repeat=args.repeat)
+
+        vectorstore = vectorstores[-1]
+        # the answer cache is emptied before every call, so qa and qa_stream always reach the model
+        answer_cache = get_answer_cache()
+        stages["qa"] = run_stage(
+            "qa", lambda question: main.answer_question(vectorstore, question, []),
+            QUESTIONS, unit="questions", repeat=args.repeat, setup=answer_cache.invalidate,
+        )
+
+        stages["qa_stream"] = run_stage(
+            "qa_stream", lambda question: "".join(main.answer_question_stream(vectorstore, question, [])),
+            QUESTIONS, unit="questions", repeat=args.repeat, setup=answer_cache.invalidate,
+        )
+
+        # repeated questions answered from the cache
+        for question in QUESTIONS:
+            main.answer_question(vectorstore, question, [])
+        hits_before = answer_cache.hits
+        stages["qa_cached"] = run_stage(
+            "qa_cached", lambda question: main.answer_question(vectorstore, question, []),
+            QUESTIONS, unit="questions", repeat=args.repeat,
+        )
+        stages["qa_cached"]["cache_hits"] = answer_cache.hits - hits_before
+
+        summary_input = chunks[corpus[1][0]]
+        summaries, llm_calls = {}, {}
+        def summarize(data, mode):
+            # the chunks were embedded by the index stages, so the fake server only sees chat requests here
+            before = server.requests
+            summaries[mode] = main.summarize(data, mode=mode, embeddings=Vectorstore().get_embeddings(cache=cache))[0]
+            llm_calls[mode] = server.requests - before
+            return summaries[mode]
+        for name, mode in (("summarize", "full"), ("summarize_extractive", "extractive")):
+            stages[name] = run_stage(
+                name, lambda data, mode=mode: summarize(data, mode), [summary_input],
+                units_of=lambda data, _: len(data), unit="chunks", repeat=args.repeat,
+            )
+            # coverage of the whole document, so both modes are scored against the same reference
+            scores = evaluate_summary(summaries[mode], summary_input)
+            stages[name].update(llm_calls=llm_calls[mode], rouge_f1={key: round(score.fmeasure, 4) for key, score in scores.items()})
+        stages["evaluate_summary"] = run_stage(
+            "evaluate_summary", lambda data: evaluate_summary(summaries["full"], data),
+            [summary_input], unit="summaries", repeat=args.repeat,
+        )
+        stages["evaluate_summary_exact"] = run_stage(
+            "evaluate_summary_exact", lambda data: evaluate_summary(summaries["full"], data, mode="exact"),
+            [summary_input], unit="summaries", repeat=args.repeat,
+        )
+
+        def translate(item):
+            translator = StructuredFileTranslator(
+                item[0], target_lang="ar", backend=IdentityBackend(), memory=TranslationMemory(":memory:"),
+            )
+            return translator.translate()
+        stages["translate"] = run_stage("translate", translate, corpus, unit="files", repeat=args.repeat)
+        llm_requests = server.requests
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "size": args.size,
+            "corpus": [{"path": os.path.basename(path), "bytes": os.path.getsize(path)} for path, _ in corpus],
+            "chunks": len(all_chunks),
+            "fake_server_requests": llm_requests,
+            "args": vars(args),
+        },
+        "stages": stages,
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('commit')}):")
+    for name, stage in current["stages"].items():
+        old = baseline["stages"].get(name)
+        if old is None:
+            continue
+        p50_ratio = stage["latency_ms"]["p50"] / old["latency_ms"]["p50"] if old["latency_ms"]["p50"] else float("nan")
+        print(f"{name:<16} p50 x{p50_ratio:5.2f}  ({old['latency_ms']['p50']:.1f}ms -> {stage['latency_ms']['p50']:.1f}ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingest -> retrieve -> answer against a local fake LLM server")
+    parser.add_argument("--size", choices=sorted(SIZES), default="small")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds of prefill per request")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="simulated seconds per generated token")
+    parser.add_argument("--no-giza", action="store_true", help="leave the bundled Giza PDF out of the corpus")
+    parser.add_argument("--work-dir", default=os.path.join("benchmarks", ".work"))
+    parser.add_argument("--output", default=None, help="result file (default benchmarks/results/<size>-<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    result = run(args)
+    output = args.output or os.path.join("benchmarks", "results", f"{args.size}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
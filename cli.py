@@ -0,0 +1,220 @@
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from main import SUMMARY_MODES, summarize, translate, detect_file_type
+from helper.ingest import file_sha256, get_ingestion_manifest
+
+
+logger = logging.getLogger("DocumentAssistant")
+
+TASKS = ("index", "summarize", "translate")
+# outputs of earlier translate runs sit next to their sources and must not be picked up as inputs
+TRANSLATED = re.compile(r"_translated_[\w-]+\.\w+$")
+
+
+def discover(paths, manifest=None):
+    # files named on the command line, every supported file under named directories, and the
+    # paths listed in a manifest (one per line, or JSON lines with a "path" key)
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                found.extend(os.path.join(root, name) for name in sorted(names))
+        else:
+            found.append(path)
+    if manifest:
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    found.append(json.loads(line)["path"] if line.startswith("{") else line)
+    files = []
+    for path in dict.fromkeys(found):
+        if TRANSLATED.search(path) or detect_file_type(path) is None:
+            continue
+        if not os.path.isfile(path):
+            logger.warning(f"Batch | skipping {path}: not a file")
+            continue
+        files.append(path)
+    return files
+
+
+class ResultLog:
+    # JSON lines, one record per (task, file) attempt, appended and flushed as soon as it finishes, so an
+    # interrupted run resumes where it stopped: successful records for an unchanged file are skipped
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed = set()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if record.get("status") == "ok":
+                        self.completed.add(self.key(record["task"], record["sha256"], self.target(record)))
+
+    @staticmethod
+    def target(record):
+        # where the result went: the language of a translation, the Qdrant storage of an index run
+        return record.get("target_lang") or record.get("persist_path")
+
+    @staticmethod
+    def key(task, sha256, target=None):
+        return task, sha256, target
+
+    def done(self, task, sha256, target=None):
+        return self.key(task, sha256, target) in self.completed
+
+    def write(self, record):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            if record["status"] == "ok":
+                self.completed.add(self.key(record["task"], record["sha256"], self.target(record)))
+
+
+def run_index(files, log, args):
+    from helper.vector_store import Vectorstore
+
+    manifest = get_ingestion_manifest()
+    builder = Vectorstore()
+    # The app holds the lock on its local Qdrant folder (data/qdrant) and searches its own temp/ copies,
+    # so by default chunks are only embedded into the shared embedding cache, which later uploads of the
+    # same documents reuse. --persist-path writes a separate collection, keyed by the paths given here.
+    if args.persist_path:
+        pipeline = builder.start_pipeline(persist_path=args.persist_path, backend="qdrant", headless=True)
+    else:
+        pipeline = builder.start_pipeline(backend="numpy", headless=True)
+    hashes = {path: file_sha256(path) for path in files}
+    todo = [(path, detect_file_type(path), hashes[path]) for path in files if args.force or not log.done("index", hashes[path], args.persist_path)]
+    start = time.perf_counter()
+    fed, failed = {}, []
+
+    def record_error(path, error):
+        failed.append(path)
+        log.write({
+            "task": "index", "file": path, "sha256": hashes[path], "persist_path": args.persist_path, "status": "error",
+            "error": f"{type(error).__name__}: {error}", "finished_at": time.time(),
+        })
+        print(f"[{len(fed) + len(failed)}/{len(todo)}] index error {path}: {error}")
+
+    # an embedding or upsert failure stops the pipeline; files already parsed are then recorded one by one
+    error = None
+    try:
+        for path, chunks, changed in manifest.ingest_many(todo, max_workers=args.workers, on_error=record_error):
+            fed[path] = ([builder.chunk_id(doc) for doc in chunks], changed, time.perf_counter() - start)
+            pipeline.feed(chunks)
+            print(f"[{len(fed) + len(failed)}/{len(todo)}] parsed {path}, {pipeline.indexed}/{pipeline.total} chunks indexed")
+        pipeline.finish()
+    except Exception as e:
+        logger.exception("Batch | indexing stopped")
+        error = f"{type(e).__name__}: {e}"
+
+    # chunks are searchable only once the pipeline has finished, so successes are recorded afterwards
+    succeeded = 0
+    for path, (chunk_ids, changed, parsed_at) in fed.items():
+        record = {"task": "index", "file": path, "sha256": hashes[path], "persist_path": args.persist_path}
+        if error is None or pipeline.stored(chunk_ids):
+            succeeded += 1
+            record.update(status="ok", chunks=len(chunk_ids), changed=changed, parsed_after_s=round(parsed_at, 3))
+        else:
+            failed.append(path)
+            record.update(status="error", error=error)
+        record.update(seconds=round(time.perf_counter() - start, 3), finished_at=time.time())
+        log.write(record)
+    return len(files) - len(todo), succeeded, len(failed)
+
+
+def _summarize_file(path, args):
+    chunks, _ = get_ingestion_manifest().ingest(path, detect_file_type(path))
+    output, tokens = summarize(chunks, mode=args.summary_mode)
+    return {"output": output, "tokens": tokens, "chunks": len(chunks)}
+
+
+def _translate_file(path, args):
+    output, _ = translate(path, args.target_lang)
+    return {"output": output}
+
+
+def run_per_file(task, files, log, args):
+    handler = {"summarize": _summarize_file, "translate": _translate_file}[task]
+    target_lang = args.target_lang if task == "translate" else None
+    hashes = {path: file_sha256(path) for path in files}
+    todo = [path for path in files if args.force or not log.done(task, hashes[path], target_lang)]
+    failed = 0
+
+    def run(path):
+        start = time.perf_counter()
+        record = {"task": task, "file": path, "sha256": hashes[path]}
+        if target_lang:
+            record["target_lang"] = target_lang
+        try:
+            record.update(handler(path, args), status="ok")
+        except Exception as e:
+            logger.exception(f"Batch | {task} failed for {path}")
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+        record.update(seconds=round(time.perf_counter() - start, 3), finished_at=time.time())
+        log.write(record)
+        return record
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(run, path) for path in todo]
+        for i, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            failed += record["status"] != "ok"
+            print(f"[{i}/{len(todo)}] {task} {record['status']:<5} {record['seconds']:8.2f}s  {record['file']}")
+    return len(files) - len(todo), len(todo) - failed, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index, summarize or translate many documents without the web UI")
+    parser.add_argument("task", choices=TASKS)
+    parser.add_argument("paths", nargs="*", help="files or directories (searched recursively)")
+    parser.add_argument("--manifest", default=None, help="file listing one document path per line (or JSON lines with a 'path' key)")
+    parser.add_argument("--workers", type=int, default=4, help="documents processed in parallel")
+    parser.add_argument("--summary-mode", choices=SUMMARY_MODES, default=None, help="default: the summary_mode setting")
+    parser.add_argument("--target-lang", default="en", help="target language for translate")
+    parser.add_argument("--output", default=os.path.join("data", "batch", "results.jsonl"), help="JSON lines results file")
+    parser.add_argument(
+        "--persist-path", default=None,
+        help="separate Qdrant storage to index into (default: only fill the embedding cache); not the app's data/qdrant",
+    )
+    parser.add_argument("--force", action="store_true", help="redo files that already have a successful result")
+    args = parser.parse_args(argv)
+
+    if args.persist_path:
+        from helper.vector_store import DEFAULT_PERSIST_PATH
+
+        # local Qdrant storage is locked by one process at a time, so sharing it with the app crashes one of them
+        if os.path.abspath(args.persist_path) == os.path.abspath(DEFAULT_PERSIST_PATH):
+            parser.error(f"--persist-path must not be the app's Qdrant storage ({DEFAULT_PERSIST_PATH})")
+
+    files = discover(args.paths, args.manifest)
+    if not files:
+        parser.error("no supported documents found")
+    log = ResultLog(args.output)
+
+    start = time.perf_counter()
+    if args.task == "index":
+        skipped, succeeded, failed = run_index(files, log, args)
+    else:
+        skipped, succeeded, failed = run_per_file(args.task, files, log, args)
+    print(
+        f"{args.task}: {succeeded} done, {failed} failed, {skipped} already complete "
+        f"in {time.perf_counter() - start:.1f}s; results in {args.output}"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,40 @@
 
 import time
+import uuid
 import logging
 import streamlit as st
-from openai import OpenAI
 # from helper.llm import LangchainLocal
-from helper.read_file import ReadFile
-from helper.process_file import ProcessFile
-from helper.vector_store import Vectorstore
 from langchain_core.messages import AIMessage, HumanMessage
 from main import (
-    detect_intent,
-    summarize,
-    translate,
-    answer_question,
-    extract_language,
+    route_query,
+    answer_question_stream,
+    get_job_queue,
     detect_file_type
 )
-from actions.summary import evaluate_summary
 
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("DocumentAssistant")
 
-# LLM Client
-llm = OpenAI(base_url="http://localhost:11434/v1", api_key="ollama")
+
+# Long-lived objects are created once per server process, on first use, instead of at every script rerun;
+# their heavy dependencies (Qdrant, loaders, rouge) are imported here rather than at startup
+@st.cache_resource
+def get_manifest():
+    from helper.ingest import get_ingestion_manifest
+    return get_ingestion_manifest()
+
+
+@st.cache_resource
+def get_vectorstore_builder():
+    from helper.vector_store import Vectorstore
+    return Vectorstore()
+
+
+@st.cache_resource
+def get_jobs():
+    return get_job_queue()
 
 
 def clear_cache():
@@ -37,6 +47,15 @@ def process_prompt():
     if st.sidebar.button("🧹 Clear Chat", use_container_width=True):
         st.session_state.chat_dialog_history = []
     st.sidebar.button("📜 New Chat", use_container_width=True, on_click=clear_cache)
+    if len(st.session_state.files) > 1:
+        names = list(st.session_state.files)
+        active = st.sidebar.selectbox(
+            "Document to summarize / translate",
+            names,
+            index=names.index(st.session_state.active_file),
+        )
+        if active != st.session_state.active_file:
+            select_file(active)
 
     # langchain_local = LangchainLocal(st.session_state)
 
@@ -52,20 +71,37 @@ def process_prompt():
         with st.chat_message("Human"):
             st.write(prompt)
         with st.chat_message("AI"):
-            intent, _ = detect_intent(query=prompt)
-
+            intent, target_lang = route_query(prompt)
+            streamed = False
 
+            # summarize and translate run as background jobs; the sidebar polls them and posts the result
             if intent == "summarize":
                 print("Summarize Tool")
-                output, _ = summarize(st.session_state.text)
-                score = evaluate_summary(output, st.session_state.text)
+                job_id = get_jobs().submit(
+                    "summarize",
+                    {
+                        "texts": [chunk.page_content for chunk in st.session_state.text],
+                        "metadata": [{"source": chunk.metadata.get("source"), "page": chunk.metadata.get("page")} for chunk in st.session_state.text],
+                    },
+                    owner=st.session_state.session_id,
+                )
+                st.session_state.jobs.append(job_id)
+                output = f"⏳ Summarizing {st.session_state.active_file} in the background. The summary will appear here when it is ready."
             elif intent == "translate":
                 print("Translate Tool")
-                target_lang = extract_language(prompt)
-                output, _ = translate(st.session_state.file, target_lang)
+                job_id = get_jobs().submit(
+                    "translate",
+                    {"file_path": st.session_state.file, "target_lang": target_lang},
+                    owner=st.session_state.session_id,
+                )
+                st.session_state.jobs.append(job_id)
+                output = f"⏳ Translating {st.session_state.active_file} in the background. You can keep asking questions meanwhile."
             elif intent == "qa":
                 print("Question Answering Tool")
-                output, _ = answer_question(st.session_state.vectorstore, prompt, st.session_state.chat_dialog_history)
+                output = st.write_stream(
+                    answer_question_stream(st.session_state.vectorstore, prompt, st.session_state.chat_dialog_history)
+                )
+                streamed = True
                 
             else:
                 output = "Sorry, I couldn't understand your request."
@@ -73,14 +109,53 @@ def process_prompt():
             print(f"\n🧠 Intent: {intent}\n📄 Output:\n{output}\n")
            
 
-            response = st.write(
-                output
-            )
+            if not streamed:
+                response = st.write(
+                    output
+                )
         st.session_state.chat_dialog_history.extend([
             HumanMessage(content=prompt),
             AIMessage(content=output)
         ])
 
+    if st.session_state.jobs:
+        with st.sidebar:
+            show_jobs()
+
+
+@st.fragment(run_every=2)
+def show_jobs():
+    # re-runs on its own every 2 seconds, so polling never blocks the chat
+    from helper.jobs import DONE, CANCELLED, FINISHED
+
+    jobs = get_jobs()
+    st.subheader("Background tasks")
+    finished = []
+    for job_id in st.session_state.jobs:
+        job = jobs.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            finished.append((job_id, job))
+            continue
+        label = f"{job['kind'].capitalize()}: {job['message'] or job['status']}"
+        st.progress(job["done"] / job["total"] if job["total"] else 0.0, text=label)
+        if st.button("Cancel", key=f"cancel-{job_id}", use_container_width=True):
+            jobs.cancel(job_id)
+
+    if finished:
+        for job_id, job in finished:
+            st.session_state.jobs.remove(job_id)
+            if job is None:
+                continue
+            if job["status"] == DONE:
+                output = job["result"]["output"]
+            elif job["status"] == CANCELLED:
+                output = f"The {job['kind']} task was cancelled."
+            else:
+                output = f"The {job['kind']} task failed: {job['error']}"
+            print(f"\n🧠 Job {job['kind']} {job['status']}\n📄 Output:\n{output}\n")
+            st.session_state.chat_dialog_history.append(AIMessage(content=output))
+        st.rerun(scope="app")
+
 
 def initialize_session_state():
     if "chat_dialog_history" not in st.session_state:
@@ -93,8 +168,16 @@ def initialize_session_state():
         st.session_state.file = None
     if "text" not in st.session_state:
         st.session_state.text = None
+    if "files" not in st.session_state:
+        st.session_state.files = {}
+    if "active_file" not in st.session_state:
+        st.session_state.active_file = None
     if "error" not in st.session_state:
         st.session_state.error = False
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    if "jobs" not in st.session_state:
+        st.session_state.jobs = []
 
 
 def initialize_ui():
@@ -140,36 +223,67 @@ def set_input_tab():
 def process_uploaded_documents(documents):
     text_chunks = []
     import os
+    import hashlib
 
     TEMP_DIR = "temp"
     os.makedirs(TEMP_DIR, exist_ok=True)
+    manifest = get_manifest()
+
+    # embedding and indexing start with the first parsed file instead of after the last one
+    from helper.vector_store import DEFAULT_PERSIST_PATH
+    pipeline = get_vectorstore_builder().start_pipeline(persist_path=DEFAULT_PERSIST_PATH)
+    indexing = st.progress(0.0, text="Indexing…")
 
+    def show_progress(indexed, total):
+        indexing.progress(indexed / total if total else 0.0, text=f"Indexed {indexed}/{total} new chunks")
 
     if documents is not None:
+        uploads = []
         for doc in documents:
-            st.write(f"Processing {doc.name}...")  
-
-            file_path = os.path.join(TEMP_DIR, doc.name)
-            with open(file_path, "wb") as f:
-                f.write(doc.getbuffer())
-
-            # Read and process the file
-            file_content = ReadFile(file_path).process(doc.type)
-            st.session_state.file = file_path
-            data = ProcessFile(file_content).process()
-            st.session_state.text = data
+            buffer = doc.getbuffer()
+            sha256 = hashlib.sha256(buffer).hexdigest()
+            # content-addressed, so two sessions uploading different files under one name never share a
+            # path: it is the chunks' source in the shared collection, the manifest key and the translate input
+            file_path = os.path.join(TEMP_DIR, sha256[:16], doc.name)
+            if not os.path.exists(file_path):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with open(file_path + ".part", "wb") as f:
+                    f.write(buffer)
+                os.replace(file_path + ".part", file_path)
+            uploads.append((file_path, doc.type, sha256))
+
+        # Read and process new or changed files in parallel, reusing the chunks of files ingested before
+        names = {file_path: os.path.basename(file_path) for file_path, _, _ in uploads}
+        def show_error(file_path, error):
+            st.warning(f"Could not read {names[file_path]}: {error}")
+
+        for file_path, data, changed in manifest.ingest_many(uploads, on_error=show_error):
+            if changed:
+                st.write(f"Processed {names[file_path]} into {len(data)} chunks.")
+            else:
+                st.write(f"{names[file_path]} is unchanged, reusing its {len(data)} chunks.")
+            st.session_state.files[names[file_path]] = {"path": file_path, "chunks": data}
             text_chunks.extend(data)
+            pipeline.feed(data, progress=show_progress)
 
-    get_vectorstore_instance = Vectorstore()
-    st.session_state.vectorstore = get_vectorstore_instance.get_vectorstore(
-        text_chunks
-    )
+    if st.session_state.files:
+        select_file(list(st.session_state.files)[-1])
+
+    st.session_state.vectorstore = pipeline.finish(progress=show_progress)
+    indexing.empty()
 
     if st.session_state.vectorstore is None:
         st.error("Unable to parse the document. It may be empty or in an unsupported format. Upload a new document and try again.")
         st.stop()
 
 
+def select_file(name):
+    # summarize and translate work on the active file
+    st.session_state.active_file = name
+    st.session_state.file = st.session_state.files[name]["path"]
+    st.session_state.text = st.session_state.files[name]["chunks"]
+
+
 
 def main():
     initialize_ui()
@@ -0,0 +1,95 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+
+
+logger = logging.getLogger("DocumentAssistant")
+
+
+def corpus_version(chunk_ids):
+    # identifies exactly which chunks a vector store holds; any upsert or deletion changes it
+    return hashlib.sha256("\n".join(sorted(chunk_ids)).encode("utf-8")).hexdigest()[:16]
+
+
+class SemanticAnswerCache:
+    # Answers keyed by (corpus version, query embedding): a new question reuses a stored answer when it is
+    # within similarity_threshold of an earlier one, retrieval returned the same chunks and the prompt
+    # carried the same chat history (history is a fingerprint of the history text sent to the model)
+    def __init__(self, similarity_threshold=0.95, ttl=3600, max_entries=1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_key = 0
+
+    def lookup(self, version, vector, chunk_ids, history=""):
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        chunk_ids = tuple(sorted(chunk_ids))
+        now = time.time()
+        with self._lock:
+            best_key, best_similarity = None, self.similarity_threshold
+            for key, entry in list(self._entries.items()):
+                if now - entry["created"] > self.ttl:
+                    del self._entries[key]
+                    continue
+                if entry["version"] != version or entry["chunk_ids"] != chunk_ids or entry["history"] != history:
+                    continue
+                similarity = float(entry["vector"] @ query)
+                if similarity >= best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            logger.info(f"Answer cache hit | similarity {best_similarity:.3f}")
+            return self._entries[best_key]["answer"]
+
+    def put(self, version, vector, chunk_ids, history, answer):
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self._lock:
+            self._entries[self._next_key] = {
+                "version": version,
+                "vector": query,
+                "chunk_ids": tuple(sorted(chunk_ids)),
+                "history": history,
+                "answer": answer,
+                "created": time.time(),
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, version=None):
+        # drop every entry, or only those built against one corpus version
+        with self._lock:
+            if version is None:
+                self._entries.clear()
+            else:
+                for key in [key for key, entry in self._entries.items() if entry["version"] == version]:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+@lru_cache(maxsize=None)
+def get_answer_cache():
+    return SemanticAnswerCache()
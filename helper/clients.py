@@ -0,0 +1,112 @@
+import threading
+import weakref
+from functools import lru_cache
+import httpx
+from langchain_core.embeddings import Embeddings
+from helper.config import settings
+
+
+# shared by every client in the process so concurrent sessions cannot oversubscribe Ollama
+request_slots = threading.BoundedSemaphore(settings.max_concurrent_requests)
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    # gives the request slot back once the response body is fully read or closed (covers streaming).
+    # A response abandoned without being closed (a generator that is never exhausted) releases its
+    # slot when it is garbage collected, so leaked streams cannot starve every later request
+    def __init__(self, stream, semaphore):
+        self.stream = stream
+        self._release = weakref.finalize(self, semaphore.release)
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            # a finalizer runs at most once, so close() and garbage collection never both release
+            self._release()
+
+
+class LimitedTransport(httpx.HTTPTransport):
+    def __init__(self, semaphore, **kwargs):
+        super().__init__(**kwargs)
+        self.semaphore = semaphore
+
+    def handle_request(self, request):
+        self.semaphore.acquire()
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            self.semaphore.release()
+            raise
+        response.stream = _ReleasingStream(response.stream, self.semaphore)
+        return response
+
+
+class LimitedEmbeddings(Embeddings):
+    def __init__(self, embeddings, semaphore):
+        self.embeddings = embeddings
+        self.semaphore = semaphore
+
+    def embed_documents(self, texts):
+        with self.semaphore:
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        with self.semaphore:
+            return self.embeddings.embed_query(text)
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=settings.max_connections,
+        max_keepalive_connections=settings.max_keepalive_connections,
+        keepalive_expiry=settings.keepalive_expiry,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_openai_client():
+    # one pooled keep-alive client for all OpenAI-compatible calls to Ollama;
+    # the SDKs below are imported on first use so the app can start without paying for them
+    from openai import OpenAI
+
+    http_client = httpx.Client(
+        transport=LimitedTransport(request_slots, limits=_limits()),
+        timeout=settings.request_timeout,
+    )
+    return OpenAI(base_url=f"{settings.ollama_base_url}/v1", api_key="ollama", http_client=http_client)
+
+
+@lru_cache(maxsize=None)
+def get_chat_ollama(model=None):
+    from langchain.callbacks import StreamingStdOutCallbackHandler
+    from langchain.callbacks.manager import CallbackManager
+    from langchain_ollama import ChatOllama
+
+    return ChatOllama(
+        base_url=settings.ollama_base_url,
+        model=model or settings.chat_model,
+        verbose=True,
+        callback_manager=CallbackManager([StreamingStdOutCallbackHandler()]),
+        temperature=settings.temperature,
+        num_ctx=settings.num_ctx,
+        num_thread=settings.num_thread,
+        stream=True,
+        client_kwargs={"limits": _limits(), "timeout": settings.request_timeout},
+    )
+
+
+@lru_cache(maxsize=None)
+def get_ollama_embeddings(model=None):
+    from langchain_ollama import OllamaEmbeddings
+
+    embeddings = OllamaEmbeddings(
+        base_url=settings.ollama_base_url,
+        model=model or settings.embedding_model,
+        num_thread=settings.num_thread,
+        client_kwargs={"limits": _limits(), "timeout": settings.request_timeout},
+    )
+    return LimitedEmbeddings(embeddings, request_slots)
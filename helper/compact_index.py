@@ -0,0 +1,154 @@
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+
+logger = logging.getLogger("DocumentAssistant")
+
+DEFAULT_INDEX_DIR = os.path.join("data", "compact_index")
+QUANTIZATIONS = (None, "int8", "binary")
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class CompactVectorStore(VectorStore):
+    # Per-session alternative to the in-memory Qdrant collection. Unit-normalized float32 vectors are
+    # written to disk and memory-mapped; only a compact code per vector stays in RAM (int8: 4x smaller,
+    # binary: 32x). Search scores every code, then re-ranks the best k * rerank_factor candidates with
+    # exact cosine similarity read from the memory map. quantization=None is a plain NumPy brute-force
+    # search over the float matrix, which is the fastest option for small corpora.
+    # Scores are cosine similarities, like Qdrant's, so the same score thresholds apply.
+    def __init__(self, embeddings, quantization="int8", rerank_factor=4, directory=DEFAULT_INDEX_DIR, name=None):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATIONS}")
+        self._embeddings = embeddings
+        self.quantization = quantization
+        self.rerank_factor = rerank_factor
+        self.directory = directory
+        # callers pass the corpus version, which prefixes the store's directory on disk
+        self.name = name or uuid.uuid4().hex
+        self._dir = None
+        self.docs = []
+        self.ids = []
+        self.vectors = None
+        self.codes = None
+        self.scale = None
+
+    @property
+    def embeddings(self):
+        return self._embeddings
+
+    def _path(self, kind):
+        if self._dir is None:
+            # a private directory per store, removed when the store is garbage-collected (or at exit),
+            # so replaced session indexes do not leave their vectors behind
+            os.makedirs(self.directory, exist_ok=True)
+            self._dir = tempfile.mkdtemp(prefix=f"{self.name}-", dir=self.directory)
+            weakref.finalize(self, shutil.rmtree, self._dir, True)
+        return os.path.join(self._dir, f"{kind}.npy")
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(texts, self._embeddings.embed_documents(texts) if texts else [], metadatas, ids)
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        # for callers that embedded the texts already (the indexing pipeline)
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [str(i) for i in ids] if ids is not None else [uuid.uuid4().hex for _ in texts]
+        if texts:
+            new_vectors = _normalize(embeddings)
+            vectors = new_vectors if self.vectors is None else np.concatenate([np.asarray(self.vectors), new_vectors])
+            self._store(vectors)
+        self.docs.extend(Document(page_content=text, metadata=dict(metadata)) for text, metadata in zip(texts, metadatas))
+        self.ids.extend(ids)
+        return ids
+
+    def _store(self, vectors):
+        # full-precision vectors live on disk and are paged in only for re-ranking
+        path = self._path("float32")
+        np.save(path + ".tmp.npy", vectors)
+        os.replace(path + ".tmp.npy", path)
+        self.vectors = np.load(path, mmap_mode="r")
+        if self.quantization == "int8":
+            # symmetric per-dimension scale, so every dimension uses the full int8 range
+            self.scale = np.maximum(np.abs(vectors).max(axis=0), 1e-12) / 127
+            self.codes = np.round(vectors / self.scale).astype(np.int8)
+        elif self.quantization == "binary":
+            self.codes = np.packbits(vectors > 0, axis=1)
+        logger.info(f"Compact index | {len(vectors)} vectors, {self.nbytes() / 2**20:.1f}MB in memory ({self.quantization or 'float32'})")
+
+    def nbytes(self):
+        # resident size of the search structures; the memory-mapped float vectors are excluded
+        # whenever a quantized code is used for the first pass
+        if self.vectors is None:
+            return 0
+        if self.codes is None:
+            return self.vectors.nbytes
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def _first_pass(self, query):
+        if self.quantization == "int8":
+            # einsum widens the int8 codes in small internal buffers instead of one float copy of the matrix
+            weighted = (query * self.scale).astype(np.float32)
+            return np.einsum("ij,j->i", self.codes, weighted, dtype=np.float32, casting="unsafe")
+        # binary: fewer differing sign bits means more similar
+        packed = np.packbits(query > 0)
+        return -np.bitwise_count(np.bitwise_xor(self.codes, packed)).sum(axis=1, dtype=np.int32).astype(np.float32)
+
+    def search_by_vector(self, embedding, k=4):
+        if self.vectors is None or k <= 0:
+            return []
+        query = _normalize(embedding)
+        count = len(self.vectors)
+        if self.codes is None:
+            scores = np.asarray(self.vectors) @ query
+            candidates = np.arange(count)
+        else:
+            approximate = self._first_pass(query)
+            shortlist = min(count, k * self.rerank_factor)
+            candidates = np.argpartition(-approximate, shortlist - 1)[:shortlist] if shortlist < count else np.arange(count)
+            # exact cosine similarity for the shortlist only, read from the memory map
+            candidates = np.sort(candidates)
+            scores = np.asarray(self.vectors[candidates]) @ query
+        top = min(k, len(candidates))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(int(candidates[i]), float(scores[i])) for i in best]
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        results = []
+        for index, score in self.search_by_vector(embedding, k=k if filter is None else len(self.docs)):
+            doc = self.docs[index]
+            if filter is not None and any(doc.metadata.get(key) != value for key, value in filter.items()):
+                continue
+            # the same "_id" metadata Qdrant puts on its hits, so the hybrid retriever can fuse them
+            results.append((Document(page_content=doc.page_content, metadata={**doc.metadata, "_id": self.ids[index]}), score))
+            if len(results) == k:
+                break
+        return results
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_with_score_by_vector(self._embeddings.embed_query(query), k=k, filter=filter)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _similarity_search_with_relevance_scores(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score(query, k, **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
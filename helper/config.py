@@ -0,0 +1,66 @@
+import json
+import os
+from types import SimpleNamespace
+import psutil
+
+
+# every model name, context size and concurrency limit lives here; override them in a JSON file
+# (DRX_CONFIG, default ./config.json) or per key with DRX_<KEY> environment variables
+DEFAULTS = {
+    "ollama_base_url": "http://localhost:11434",
+    "chat_model": "llama3.2:3b",
+    "embedding_model": "nomic-embed-text:latest",
+    "temperature": 0.4,
+    "num_ctx": 512,
+    "num_thread": max(1, int(psutil.cpu_count() * 0.9)),
+    # requests allowed in flight against the Ollama server, across all sessions of this process
+    "max_concurrent_requests": 4,
+    "max_connections": 16,
+    "max_keepalive_connections": 8,
+    "keepalive_expiry": 30.0,
+    "request_timeout": 600.0,
+    # background workers running summarize/translate jobs for all sessions
+    "job_workers": 2,
+    # spans from helper/tracing.py are appended here as JSON lines; set to "" to turn tracing off
+    "trace_path": "data/traces.jsonl",
+    # CSV/XLSX files above this size are ingested in row batches instead of being loaded whole
+    "stream_tabular_mb": 20.0,
+    "stream_batch_rows": 5000,
+    # "qdrant" (default), "compact" (quantized NumPy index with exact re-ranking) or "numpy" (brute force)
+    "vector_backend": "qdrant",
+    "compact_quantization": "int8",
+    "compact_rerank_factor": 4,
+    # indexing pipeline: chunks per embedding request, concurrent requests, batches queued before feeding blocks
+    "embed_batch_size": 64,
+    "embed_workers": 4,
+    "embed_max_pending": 16,
+    # processes redrawing translated PDF pages
+    "translate_pdf_workers": max(1, (os.cpu_count() or 2) - 1),
+    # "extractive" summarizes only the chunks representative of each topic (at most summary_chunk_budget
+    # of them, picked by clustering their embeddings) once a document has at least twice that many chunks;
+    # "full" summarizes every chunk
+    "summary_mode": "extractive",
+    "summary_chunk_budget": 12,
+}
+
+
+def _cast(value, default):
+    if isinstance(default, bool):
+        return str(value).lower() in ("1", "true", "yes", "on")
+    return type(default)(value)
+
+
+def load_settings(path=None):
+    values = dict(DEFAULTS)
+    path = path or os.environ.get("DRX_CONFIG", "config.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            values.update({key: _cast(value, DEFAULTS[key]) for key, value in json.load(f).items() if key in DEFAULTS})
+    for key, default in DEFAULTS.items():
+        env_value = os.environ.get(f"DRX_{key.upper()}")
+        if env_value is not None:
+            values[key] = _cast(env_value, default)
+    return SimpleNamespace(**values)
+
+
+settings = load_settings()
@@ -0,0 +1,60 @@
+import re
+import tiktoken
+from helper.process_file import ENCODING_NAME
+
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+class ContextBuilder:
+    # Packs retrieved chunks and chat history into bounded token budgets so prompt size
+    # (and prefill time) no longer grows with the conversation or the retrieved text
+    def __init__(self, encoding_name=ENCODING_NAME, context_tokens=1500, history_tokens=500, history_turns=6, message_tokens=200):
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        self.context_tokens = context_tokens
+        self.history_tokens = history_tokens
+        self.history_turns = history_turns
+        self.message_tokens = message_tokens
+
+    def _truncate(self, text, max_tokens):
+        tokens = self.encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text, len(tokens)
+        return self.encoding.decode(tokens[:max_tokens]) + " …", max_tokens
+
+    def build_context(self, docs_and_scores):
+        # highest relevance first; sentences already included through an overlapping
+        # neighbour chunk are dropped so the 300-token overlap is not sent twice
+        seen = set()
+        sections = []
+        remaining = self.context_tokens
+        for doc, _ in sorted(docs_and_scores, key=lambda pair: pair[1], reverse=True):
+            if remaining < 32:
+                break
+            sentences = []
+            for sentence in SENTENCE_BOUNDARY.split(doc.page_content):
+                key = " ".join(sentence.split()).lower()
+                if key and key not in seen:
+                    seen.add(key)
+                    sentences.append(sentence.strip())
+            if not sentences:
+                continue
+
+            header = f"[{doc.metadata.get('source', 'document')}, page {doc.metadata.get('page', 0)}]"
+            text, used = self._truncate(f"{header}\n{' '.join(sentences)}", remaining)
+            sections.append(text)
+            remaining -= used
+        return "\n\n".join(sections)
+
+    def build_history(self, chat_history):
+        # rolling window over the most recent turns; long messages (e.g. summaries) are clipped
+        lines = []
+        remaining = self.history_tokens
+        for message in reversed(chat_history[-2 * self.history_turns:]):
+            role = "User" if getattr(message, "type", "") == "human" else "Assistant"
+            text, used = self._truncate(getattr(message, "content", str(message)), min(self.message_tokens, remaining))
+            lines.append(f"{role}: {text}")
+            remaining -= used
+            if remaining <= 0:
+                break
+        return "\n".join(reversed(lines))
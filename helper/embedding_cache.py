@@ -0,0 +1,67 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from helper.lru_store import SQLiteLRUStore, text_hash
+from helper.tracing import span
+
+
+DEFAULT_CACHE_PATH = os.path.join("data", "embedding_cache.sqlite")
+
+
+class EmbeddingCache(SQLiteLRUStore):
+    # On-disk embedding store keyed by (model name, sha256 of text) with LRU eviction
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=200_000):
+        super().__init__(path, max_entries, label="Embedding cache")
+
+    def get_many(self, model, texts):
+        hashes = [text_hash(text) for text in texts]
+        found = super().get_many(model, hashes)
+        return [np.frombuffer(found[h], dtype=np.float32).tolist() if h in found else None for h in hashes]
+
+    def put_many(self, model, texts, vectors):
+        super().put_many(model, [
+            (text_hash(text), np.asarray(vector, dtype=np.float32).tobytes()) for text, vector in zip(texts, vectors)
+        ])
+
+
+class CachedEmbeddings(Embeddings):
+    # Wraps any LangChain embeddings model and only sends cache misses to it
+    def __init__(self, embeddings, model_name, cache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts):
+        with span("embed.documents", texts=len(texts)) as attrs:
+            vectors = self.cache.get_many(self.model_name, texts)
+
+            # deduplicate misses so overlapping chunks within one batch are embedded once
+            missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+            attrs.update(cache_hits=len(texts) - sum(vector is None for vector in vectors), embedded=len(missing))
+            if missing:
+                attrs["bytes"] = sum(len(text.encode("utf-8")) for text in missing)
+                new_vectors = self.embeddings.embed_documents(missing)
+                self.cache.put_many(self.model_name, missing, new_vectors)
+                computed = dict(zip(missing, new_vectors))
+                vectors = [vector if vector is not None else computed[text] for text, vector in zip(texts, vectors)]
+
+        return [list(vector) for vector in vectors]
+
+    def embed_query(self, text):
+        # queries are cached under their own namespace since some models embed them differently
+        query_model = f"{self.model_name}::query"
+        with span("embed.query") as attrs:
+            (vector,) = self.cache.get_many(query_model, [text])
+            attrs["cache_hits"] = int(vector is not None)
+            if vector is None:
+                vector = self.embeddings.embed_query(text)
+                self.cache.put_many(query_model, [text], [vector])
+        return list(vector)
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache(path=DEFAULT_CACHE_PATH, max_entries=200_000):
+    # one shared cache per path so all Streamlit sessions reuse the same connection
+    return EmbeddingCache(path=path, max_entries=max_entries)
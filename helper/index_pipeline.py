@@ -0,0 +1,234 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from langchain_community.vectorstores import Qdrant
+from langchain_core.documents import Document
+from qdrant_client.http import models as rest
+from helper.config import settings
+from helper.answer_cache import corpus_version
+from helper.lexical_index import BM25Index
+from helper.tracing import span
+
+
+logger = logging.getLogger("DocumentAssistant")
+
+_DONE = object()
+
+
+class IndexingPipeline:
+    # Producer/consumer indexing: the caller feeds chunks as files finish parsing, embedding batches of
+    # batch_size run concurrently on `workers` threads, and a single indexer thread upserts each batch as
+    # soon as its vectors are ready. At most max_pending batches are queued or in flight; feed() blocks
+    # beyond that, which keeps memory bounded when parsing outpaces the embedding model.
+    # Progress is reported on the calling thread only (Streamlit elements cannot be updated from others).
+    # Built by Vectorstore.start_pipeline, which supplies the Qdrant client and store (None for the
+    # compact backends) and the collection's write lock.
+    # headless=True (batch CLI) keeps only chunk IDs and builds no session index (BM25 or compact store);
+    # without a Qdrant store it then just embeds, which fills the embedding cache.
+    def __init__(self, vectorstore_builder, embeddings, backend, client=None, vectorstore=None,
+                 collection_name=None, write_lock=None, persistent=False,
+                 batch_size=None, workers=None, max_pending=None, headless=False):
+        self.builder = vectorstore_builder
+        self.embeddings = embeddings
+        self.backend = backend
+        self.client = client
+        self.vectorstore = vectorstore
+        self.collection_name = collection_name
+        self.write_lock = write_lock or threading.Lock()
+        self.persistent = persistent
+        self.batch_size = batch_size or settings.embed_batch_size
+        self.workers = workers or settings.embed_workers
+        self.slots = threading.BoundedSemaphore(max_pending or settings.embed_max_pending)
+        self.headless = headless
+
+        self.wanted = {}
+        self.existing = set()
+        self.sources = set()
+        self.total = 0
+        self.indexed = 0
+        self.upserted = set()
+        self.errors = []
+        self._lock = threading.Lock()
+        self._ready = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embed")
+        self._futures = []
+        self._compact = []
+        self._start = time.perf_counter()
+        self._indexer = threading.Thread(target=self._index_loop, name="indexer", daemon=True)
+        self._indexer.start()
+
+    def feed(self, chunks, progress=None):
+        # chunks: the chunks of one or more files; chunks already stored under the same ID are skipped
+        new_sources = {doc.metadata.get("source") for doc in chunks} - self.sources
+        if new_sources and self.persistent:
+            self.existing |= self.builder.existing_ids(self.client, new_sources)
+        self.sources |= new_sources
+
+        batch = []
+        for doc in chunks:
+            chunk_id = self.builder.chunk_id(doc)
+            if chunk_id in self.wanted:
+                continue
+            self.wanted[chunk_id] = None if self.headless else doc
+            if chunk_id in self.existing:
+                continue
+            batch.append((chunk_id, doc))
+            if len(batch) == self.batch_size:
+                self._submit(batch, progress)
+                batch = []
+        if batch:
+            self._submit(batch, progress)
+
+    def _submit(self, batch, progress):
+        self._raise_errors()
+        with self._lock:
+            self.total += len(batch)
+        # backpressure: wait for a free slot, reporting progress meanwhile
+        while not self.slots.acquire(timeout=0.2):
+            self._raise_errors()
+            self._report(progress)
+        self._futures.append(self._pool.submit(self._embed, batch))
+        self._report(progress)
+
+    def _embed(self, batch):
+        try:
+            with span("index.embed_batch", chunks=len(batch)):
+                vectors = self.embeddings.embed_documents([doc.page_content for _, doc in batch])
+            self._ready.put((batch, vectors))
+        except Exception as e:
+            self.errors.append(e)
+            self.slots.release()
+            raise
+
+    def _index_loop(self):
+        while True:
+            item = self._ready.get()
+            if item is _DONE:
+                return
+            batch, vectors = item
+            try:
+                with span("index.upsert", chunks=len(batch), backend=self.backend):
+                    self._upsert(batch, vectors)
+            except Exception as e:
+                logger.exception("Indexing | upsert failed")
+                self.errors.append(e)
+            else:
+                with self._lock:
+                    self.indexed += len(batch)
+                    self.upserted.update(chunk_id for chunk_id, _ in batch)
+            finally:
+                self.slots.release()
+
+    def _upsert(self, batch, vectors):
+        if self.vectorstore is None:
+            # compact indexes are written once at the end, since each write saves the whole matrix
+            if not self.headless:
+                self._compact.append((batch, vectors))
+            return
+        with self.write_lock:
+            if not self.client.collection_exists(self.collection_name):
+                self.client.create_collection(
+                    collection_name=self.collection_name,
+                    vectors_config=rest.VectorParams(size=len(vectors[0]), distance=rest.Distance.COSINE),
+                )
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=[
+                    rest.PointStruct(
+                        id=chunk_id,
+                        vector=list(vector),
+                        payload={Qdrant.CONTENT_KEY: doc.page_content, Qdrant.METADATA_KEY: doc.metadata},
+                    )
+                    for (chunk_id, doc), vector in zip(batch, vectors)
+                ],
+            )
+
+    def stored(self, chunk_ids):
+        # whether every chunk was upserted by this pipeline or already in the collection, e.g. to tell
+        # which files were completely indexed before a failure
+        with self._lock:
+            return all(chunk_id in self.upserted or chunk_id in self.existing for chunk_id in chunk_ids)
+
+    def _report(self, progress):
+        if progress is not None:
+            with self._lock:
+                indexed, total = self.indexed, self.total
+            progress(indexed, total)
+
+    def _raise_errors(self):
+        # fail fast: once a batch failed, stop embedding the rest and surface the first error
+        if self.errors:
+            self._stop(cancel=True)
+            raise self.errors[0]
+
+    def _stop(self, cancel=False):
+        self._pool.shutdown(wait=True, cancel_futures=cancel)
+        if self._indexer.is_alive():
+            self._ready.put(_DONE)
+            self._indexer.join()
+
+    def finish(self, progress=None):
+        # waits for every batch, removes this session's stale points and returns the ready vector store
+        # cancelled futures count as done here but would block wait() forever
+        pending = {future for future in self._futures if not future.done()}
+        while pending:
+            # the timeout only wakes the caller to report progress; without a callback it blocks until done
+            _, pending = wait(pending, timeout=0.2 if progress is not None else None)
+            self._report(progress)
+        self._stop()
+        self._report(progress)
+        if self.errors:
+            raise self.errors[0]
+        if not self.wanted:
+            return None
+
+        ids = list(self.wanted)
+        if self.vectorstore is not None:
+            # sources are content-addressed upload paths, so the only other points under them are this
+            # content's chunks from an earlier chunking configuration
+            stale = self.existing - self.wanted.keys()
+            if stale:
+                with self.write_lock:
+                    self.client.delete(collection_name=self.collection_name, points_selector=rest.PointIdsList(points=list(stale)))
+            if self.persistent:
+                self.vectorstore.sources = sorted(self.sources)
+            vectorstore = self.vectorstore
+            logger.info(
+                f"Indexing | {len(ids)} chunks: {self.indexed} embedded and upserted, "
+                f"{len(ids) - self.indexed} unchanged, {len(stale)} deleted"
+            )
+        elif self.headless:
+            vectorstore = None
+        else:
+            vectorstore = self._finish_compact(ids)
+
+        if vectorstore is not None:
+            vectorstore.corpus_version = corpus_version(ids)
+        if not self.headless:
+            with span("index.lexical", chunks=len(ids)):
+                vectorstore.lexical_index = BM25Index(
+                    Document(page_content=doc.page_content, metadata={**doc.metadata, "_id": chunk_id})
+                    for chunk_id, doc in self.wanted.items()
+                )
+        logger.info(f"Indexing | ready in {time.perf_counter() - self._start:.2f}s, {self.embeddings.cache.stats()}")
+        return vectorstore
+
+    def _finish_compact(self, ids):
+        from helper.compact_index import CompactVectorStore
+
+        store = CompactVectorStore(
+            self.embeddings,
+            quantization=settings.compact_quantization if self.backend == "compact" else None,
+            rerank_factor=settings.compact_rerank_factor,
+            name=corpus_version(ids),
+        )
+        batches = [pair for batch, vectors in self._compact for pair in zip(batch, vectors)]
+        store.add_embeddings(
+            [doc.page_content for (_, doc), _ in batches],
+            [vector for _, vector in batches],
+            metadatas=[doc.metadata for (_, doc), _ in batches],
+            ids=[chunk_id for (chunk_id, _), _ in batches],
+        )
+        return store
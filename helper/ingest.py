@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from functools import lru_cache
+from langchain_core.documents import Document
+from helper.read_file import ReadFile, is_large_tabular
+from helper.process_file import ProcessFile
+from helper.vector_store import Vectorstore
+from helper.tracing import span
+
+
+logger = logging.getLogger("DocumentAssistant")
+
+DEFAULT_INGEST_DIR = os.path.join("data", "ingest")
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_and_chunk(file_path, content_type):
+    if is_large_tabular(file_path, content_type):
+        # chunk each row batch as it is read instead of holding every row document at once
+        with span("ingest.stream", file=file_path, bytes=os.path.getsize(file_path)) as attrs:
+            chunks = [chunk for documents in ReadFile(file_path).stream(content_type) for chunk in ProcessFile(documents).process()]
+            attrs["chunks"] = len(chunks)
+        return chunks
+    with span("ingest.parse", file=file_path, bytes=os.path.getsize(file_path)):
+        documents = ReadFile(file_path).process(content_type)
+    with span("ingest.chunk", file=file_path, documents=len(documents)) as attrs:
+        chunks = ProcessFile(documents).process()
+        attrs["chunks"] = len(chunks)
+    return chunks
+
+
+class IngestionManifest:
+    # Remembers what every ingested file looked like (hash, size, mtime) and the chunks it produced,
+    # so unchanged files are never parsed or chunked twice
+    def __init__(self, directory=DEFAULT_INGEST_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.chunks_dir = os.path.join(directory, "chunks")
+        self._lock = threading.Lock()
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        self.entries = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def _save(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def lookup(self, file_path, sha256=None):
+        # size + mtime is the cheap check; the content hash decides when they differ
+        entry = self.entries.get(file_path)
+        if entry is None or not os.path.exists(file_path):
+            return None
+        stat = os.stat(file_path)
+        if sha256 is None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return entry
+        if (sha256 or file_sha256(file_path)) == entry["sha256"]:
+            return entry
+        return None
+
+    def load_chunks(self, entry):
+        with open(os.path.join(self.chunks_dir, f"{entry['sha256']}.json"), "r", encoding="utf-8") as f:
+            return [Document(page_content=item["page_content"], metadata=item["metadata"]) for item in json.load(f)]
+
+    def record(self, file_path, content_type, chunks, sha256=None):
+        stat = os.stat(file_path)
+        sha256 = sha256 or file_sha256(file_path)
+        with open(os.path.join(self.chunks_dir, f"{sha256}.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                [{"page_content": chunk.page_content, "metadata": chunk.metadata} for chunk in chunks],
+                f,
+                default=str,
+            )
+        entry = {
+            "sha256": sha256,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "content_type": content_type,
+            "chunk_ids": [Vectorstore.chunk_id(chunk) for chunk in chunks],
+            "ingested_at": time.time(),
+        }
+        with self._lock:
+            previous = self.entries.get(file_path)
+            self.entries[file_path] = entry
+            self._save()
+            # the file changed: its old chunks are dead unless another path has the same content
+            if previous is not None and previous["sha256"] != sha256:
+                self._remove_unused_chunks(previous["sha256"])
+        return entry
+
+    def remove(self, file_path):
+        with self._lock:
+            entry = self.entries.pop(file_path, None)
+            self._save()
+            if entry is not None:
+                self._remove_unused_chunks(entry["sha256"])
+        return entry
+
+    def _remove_unused_chunks(self, sha256):
+        # called with the lock held
+        if any(e["sha256"] == sha256 for e in self.entries.values()):
+            return
+        chunks_path = os.path.join(self.chunks_dir, f"{sha256}.json")
+        if os.path.exists(chunks_path):
+            os.remove(chunks_path)
+
+    def ingest(self, file_path, content_type, sha256=None, loader=load_and_chunk):
+        # returns (chunks, changed); loader(file_path, content_type) parses and chunks a new/changed file
+        entry = self.lookup(file_path, sha256)
+        if entry is not None:
+            logger.info(f"Ingest | {file_path} unchanged, reusing {len(entry['chunk_ids'])} chunks")
+            return self.load_chunks(entry), False
+        chunks = loader(file_path, content_type)
+        self.record(file_path, content_type, chunks, sha256)
+        logger.info(f"Ingest | {file_path} processed into {len(chunks)} chunks")
+        return chunks, True
+
+    def ingest_many(self, files, max_workers=None, on_error=None):
+        # files: (file_path, content_type, sha256) tuples. Yields (file_path, chunks, changed) per file;
+        # new or changed files are parsed in a process pool and chunked part by part as they arrive.
+        # A file that cannot be read is logged, passed to on_error(file_path, error) and skipped
+        pending = {}
+        for file_path, content_type, sha256 in files:
+            entry = self.lookup(file_path, sha256)
+            if entry is not None:
+                yield file_path, self.load_chunks(entry), False
+            else:
+                pending[file_path] = (content_type, sha256)
+
+        parts = {}
+        failed = set()
+        loads = ReadFile.process_many([(file_path, content_type) for file_path, (content_type, _) in pending.items()], max_workers)
+        for loaded in loads:
+            if loaded.file_path in failed:
+                continue
+            if loaded.error is not None:
+                failed.add(loaded.file_path)
+                parts.pop(loaded.file_path, None)
+                logger.error(f"Ingest | could not read {loaded.file_path}: {type(loaded.error).__name__}: {loaded.error}")
+                if on_error is not None:
+                    on_error(loaded.file_path, loaded.error)
+                continue
+            file_parts = parts.setdefault(loaded.file_path, {})
+            with span("ingest.chunk", file=loaded.file_path, documents=len(loaded.documents)) as attrs:
+                file_parts[loaded.part] = ProcessFile(loaded.documents).process()
+                attrs["chunks"] = len(file_parts[loaded.part])
+            if len(file_parts) == loaded.total_parts:
+                chunks = [chunk for part in sorted(file_parts) for chunk in file_parts.pop(part)]
+                parts.pop(loaded.file_path)
+                content_type, sha256 = pending[loaded.file_path]
+                self.record(loaded.file_path, content_type, chunks, sha256)
+                logger.info(f"Ingest | {loaded.file_path} processed into {len(chunks)} chunks")
+                yield loaded.file_path, chunks, True
+
+
+@lru_cache(maxsize=None)
+def get_ingestion_manifest(directory=DEFAULT_INGEST_DIR):
+    return IngestionManifest(directory)
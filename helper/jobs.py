@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+logger = logging.getLogger("DocumentAssistant")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueue:
+    # Long-running tasks (summarize, translate) run on a small worker pool instead of the Streamlit
+    # script thread. Jobs are rows in SQLite, so status, progress and results outlive script reruns and
+    # sessions; workers claim queued rows oldest first. Handlers are called as handler(payload, progress)
+    # and must return something JSON-serializable; progress(done, total, message=None) records progress
+    # and raises JobCancelled once the job has been cancelled, so cancellation is cooperative.
+    def __init__(self, path="data/jobs.sqlite", max_workers=2, poll_interval=1.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.handlers = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._workers = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, owner TEXT, status TEXT NOT NULL, "
+                "payload TEXT NOT NULL, result TEXT, error TEXT, "
+                "done INTEGER NOT NULL DEFAULT 0, total INTEGER NOT NULL DEFAULT 0, message TEXT, "
+                "cancel_requested INTEGER NOT NULL DEFAULT 0, "
+                "created REAL NOT NULL, started REAL, finished REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+            # a job still marked running was cut off by a restart of the previous process
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE status = ?",
+                (FAILED, "interrupted by a server restart", time.time(), RUNNING),
+            )
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def submit(self, kind, payload, owner=None):
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job_id = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, owner, status, payload, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, owner, QUEUED, json.dumps(payload), time.time()),
+            )
+        self._start_workers()
+        self._wakeup.set()
+        logger.info(f"Jobs | queued {kind} job {job_id}")
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, owner, status, result, error, done, total, message, created, started, finished "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, owner=None, limit=20):
+        query = (
+            "SELECT id, kind, owner, status, result, error, done, total, message, created, started, finished FROM jobs"
+        )
+        params = ()
+        if owner is not None:
+            query += " WHERE owner = ?"
+            params = (owner,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created DESC LIMIT ?", (*params, limit)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def cancel(self, job_id):
+        # queued jobs are cancelled right away; running ones stop at their next progress report
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING)
+            )
+
+    def purge(self, older_than=7 * 24 * 3600):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished < ?",
+                (*FINISHED, time.time() - older_than),
+            )
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def _to_dict(self, row):
+        keys = ("id", "kind", "owner", "status", "result", "error", "done", "total", "message", "created", "started", "finished")
+        job = dict(zip(keys, row))
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, name=f"job-worker-{len(self._workers)}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _claim(self):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id, kind, payload FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = self._conn.execute(
+                "UPDATE jobs SET status = ?, started = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), row[0], QUEUED),
+            ).rowcount
+        return row if claimed else None
+
+    def _progress(self, job_id, done, total, message=None):
+        with self._lock, self._conn:
+            # updates from pool threads can arrive out of order; within one phase (same total and
+            # message) progress never moves backwards
+            self._conn.execute(
+                "UPDATE jobs SET done = CASE WHEN total = :total AND (:message IS NULL OR message = :message) "
+                "AND done > :done THEN done ELSE :done END, total = :total, message = COALESCE(:message, message) "
+                "WHERE id = :id",
+                {"done": done, "total": total, "message": message, "id": job_id},
+            )
+            cancelled = self._conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()[0]
+        if cancelled:
+            raise JobCancelled(job_id)
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+
+    def _work(self):
+        while True:
+            job = self._claim()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            job_id, kind, payload = job
+            start = time.time()
+            try:
+                result = self.handlers[kind](
+                    json.loads(payload),
+                    lambda done, total, message=None: self._progress(job_id, done, total, message),
+                )
+            except JobCancelled:
+                self._finish(job_id, CANCELLED)
+                logger.info(f"Jobs | {kind} job {job_id} cancelled after {time.time() - start:.2f}s")
+            except Exception as e:
+                logger.exception(f"Jobs | {kind} job {job_id} failed")
+                self._finish(job_id, FAILED, error=str(e))
+            else:
+                self._finish(job_id, DONE, result=result)
+                logger.info(f"Jobs | {kind} job {job_id} done in {time.time() - start:.2f}s")
@@ -0,0 +1,101 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+# function words carry no topic, but otherwise every question matches every chunk lexically
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers herself him himself his how i if in into is it its itself just me more most my myself no
+nor not now of off on once only or other our ours ourselves out over own same she should so some such than
+that the their theirs them themselves then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your yours yourself yourselves
+tell explain describe give show please
+""".split())
+
+
+def tokenize(text):
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    # Inverted index over chunk text, built once at ingest next to the Qdrant collection,
+    # so exact names and numbers can be found even when embeddings miss them
+    def __init__(self, docs, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = list(docs)
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        for i, doc in enumerate(self.docs):
+            counts = Counter(tokenize(doc.page_content))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((i, tf))
+        self.avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        n = len(self.docs)
+        self.idf = {
+            term: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def reference_score(self, query):
+        # the score of an average-length chunk containing every query term once (the sum of their idf);
+        # terms missing from the corpus count with the highest possible idf, so they lower every ratio
+        n = len(self.docs)
+        missing_idf = math.log(1 + (n + 0.5) / 0.5)
+        return sum(self.idf.get(term, missing_idf) for term in set(tokenize(query)))
+
+    def search(self, query, k=10):
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / (self.avg_length or 1.0))
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.docs[i], score) for i, score in ranked]
+
+
+class HybridRetriever:
+    # Fuses BM25 and vector rankings with reciprocal rank fusion. A chunk qualifies when it passes the
+    # vector score_threshold or its BM25 score is at least lexical_min_score times the query's reference
+    # score (roughly: it contains the query terms carrying that share of the query's idf weight); if
+    # nothing qualifies, the top fallback_k fused chunks are used
+    def __init__(self, vector_store, lexical_index, score_threshold=0.8, candidate_k=20, rrf_k=60, fallback_k=4, lexical_min_score=0.5):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.score_threshold = score_threshold
+        self.candidate_k = candidate_k
+        self.rrf_k = rrf_k
+        self.fallback_k = fallback_k
+        self.lexical_min_score = lexical_min_score
+
+    def search(self, query, k=8):
+        vector_hits = self.vector_store.similarity_search_with_relevance_scores(query, k=self.candidate_k)
+        lexical_hits = self.lexical_index.search(query, k=self.candidate_k)
+
+        fused, docs, qualified = defaultdict(float), {}, set()
+        for rank, (doc, score) in enumerate(vector_hits):
+            key = doc.metadata.get("_id")
+            fused[key] += 1 / (self.rrf_k + rank + 1)
+            docs[key] = doc
+            if score >= self.score_threshold:
+                qualified.add(key)
+        reference = self.lexical_index.reference_score(query) if lexical_hits else 0.0
+        for rank, (doc, score) in enumerate(lexical_hits):
+            key = doc.metadata.get("_id")
+            fused[key] += 1 / (self.rrf_k + rank + 1)
+            docs.setdefault(key, doc)
+            if reference and score / reference >= self.lexical_min_score:
+                qualified.add(key)
+
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+        results = [(docs[key], score) for key, score in ranked if key in qualified][:k]
+        if not results:
+            results = [(docs[key], score) for key, score in ranked[:self.fallback_k]]
+        return results
@@ -1,28 +1,15 @@
-from langchain.callbacks import StreamingStdOutCallbackHandler
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 
-from langchain.callbacks.manager import CallbackManager
-from langchain_ollama import ChatOllama
-
-import psutil
+from helper.clients import get_chat_ollama
 
 
 
 class LangchainLocal:
-    def __init__(self, session_state, model="llama3.2:3b"):
+    def __init__(self, session_state, model=None):
         self.session_state = session_state
-        self.llm = ChatOllama(
-                base_url="http://localhost:11434",
-                model=model,
-                verbose=True,
-                callback_manager=CallbackManager([StreamingStdOutCallbackHandler()]),
-                temperature=0.4,
-                num_ctx=512,
-                num_thread=max(1, int(psutil.cpu_count() * 0.9)),
-                stream=True,
-            )
+        self.llm = get_chat_ollama(model)
         
 
     def get_context_retriever_chain(self, vector_store):
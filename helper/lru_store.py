@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+logger = logging.getLogger("DocumentAssistant")
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SQLiteLRUStore:
+    # On-disk key/value store with LRU eviction, shared by the embedding cache and the translation memory.
+    # Entries are keyed by (namespace, key hash), e.g. (model name, sha256 of text); values are stored
+    # as given (bytes or text)
+    def __init__(self, path, max_entries, label="LRU store"):
+        self.path = path
+        self.max_entries = max_entries
+        self.label = label
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key_hash TEXT NOT NULL,
+                value BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (namespace, key_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used)")
+        self._conn.commit()
+        # upper bound on the row count (replaced rows are counted twice), so writes skip COUNT(*)
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+
+    def get_many(self, namespace, hashes):
+        # returns {hash: value} for the stored hashes; hits and misses count every hash passed in
+        found = {}
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            # stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key_hash, value FROM entries WHERE namespace = ? AND key_hash IN ({placeholders})",
+                    [namespace, *batch],
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET last_used = ? WHERE namespace = ? AND key_hash = ?",
+                    [(now, namespace, key_hash) for key_hash in found],
+                )
+                self._conn.commit()
+
+            hit_count = sum(key_hash in found for key_hash in hashes)
+            self.hits += hit_count
+            self.misses += len(hashes) - hit_count
+        return found
+
+    def put_many(self, namespace, items):
+        # items: (hash, value) pairs
+        now = time.time()
+        rows = [(namespace, key_hash, value, now) for key_hash, value in items]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (namespace, key_hash, value, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._count += len(rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self._count <= self.max_entries:
+            return
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        # evict down to 90% so a full store is not counted again on the very next write
+        overflow = count - int(self.max_entries * 0.9) if count > self.max_entries else 0
+        self._count = count - overflow
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY last_used ASC LIMIT ?)",
+                (overflow,),
+            )
+            logger.info(f"{self.label} evicted {overflow} least recently used entries")
+
+    def stats(self):
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": size,
+                "max_entries": self.max_entries,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._count = 0
+            self.hits = 0
+            self.misses = 0
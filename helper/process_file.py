@@ -1,25 +1,68 @@
+import re
 import tiktoken
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 
+SEPARATORS = ["\n\n", "\n", " ", ""]
+ENCODING_NAME = "cl100k_base"
+
+
+def _split_keeping_separator(text, separator):
+    # the first split RecursiveCharacterTextSplitter makes (keep_separator=True): every separator stays
+    # at the start of the piece that follows it
+    pieces = re.split(f"({re.escape(separator)})", text)
+    pieces = pieces[:1] + [pieces[i] + pieces[i + 1] for i in range(1, len(pieces) - 1, 2)]
+    return [piece for piece in pieces if piece]
+
 
 class ProcessFile:
-    def __init__(self, document, encoding_name="cl100k_base", chunk_size=1000, chunk_overlap=300):
+    def __init__(self, document, encoding_name=ENCODING_NAME, chunk_size=1000, chunk_overlap=300):
         self.document = document
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.encoding = tiktoken.get_encoding(encoding_name)
+        self._length_cache = {}
 
-    def process(self):
-        
-        splitter = RecursiveCharacterTextSplitter(
-            separators=["\n\n", "\n", " ", ""],
+    def token_length(self, text):
+        # the recursive splitter measures the same pieces (and separators) many times over
+        length = self._length_cache.get(text)
+        if length is None:
+            length = len(self.encoding.encode(text))
+            self._length_cache[text] = length
+        return length
+
+    def _prefill_lengths(self, texts):
+        # the splitter starts by measuring every top-level piece of each document,
+        # so encode all of them up front in one multi-threaded encode_batch call
+        pieces = []
+        for text in texts:
+            separator = next((s for s in SEPARATORS if s and s in text), None)
+            if separator is not None:
+                pieces.extend(_split_keeping_separator(text, separator))
+        pieces = [piece for piece in dict.fromkeys(pieces) if piece not in self._length_cache]
+        for piece, tokens in zip(pieces, self.encoding.encode_batch(pieces)):
+            self._length_cache[piece] = len(tokens)
+
+    def _splitter(self):
+        return RecursiveCharacterTextSplitter(
+            separators=SEPARATORS,
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
-            length_function=lambda text: len(self.encoding.encode(text)),
+            length_function=self.token_length,
         )
 
-        chunks = splitter.split_documents(self.document)
-        return chunks
+    def process(self):
+        return self._split([self.document])[0]
+
+    @classmethod
+    def process_batch(cls, documents, **kwargs):
+        # documents: a list of per-file document lists; returns one chunk list per file
+        return cls(None, **kwargs)._split(documents)
 
-      
\ No newline at end of file
+    def _split(self, documents):
+        splitter = self._splitter()
+        self._prefill_lengths([doc.page_content for docs in documents for doc in docs])
+        try:
+            return [splitter.split_documents(docs) for docs in documents]
+        finally:
+            self._length_cache.clear()
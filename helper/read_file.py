@@ -1,8 +1,40 @@
+import os
+from itertools import islice
 from langchain_community.document_loaders import TextLoader
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.document_loaders import Docx2txtLoader
 from langchain_community.document_loaders.csv_loader import CSVLoader
-from langchain_community.document_loaders import UnstructuredExcelLoader
+from langchain_core.documents import Document
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pypdf import PdfReader
+from helper.config import settings
+from helper.tracing import span
+
+
+# one finished unit of work from ReadFile.process_many: a whole file, a page range of a large PDF or a
+# row batch of a large CSV/XLSX. Streamed row batches only learn total_parts with their last batch, so
+# earlier batches carry None. A file that could not be read yields one part with the exception in error
+LoadedPart = namedtuple("LoadedPart", ["file_path", "part", "total_parts", "documents", "error"], defaults=(None,))
+
+TABULAR_TYPES = ("text/csv", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+
+def is_large_tabular(file_path, content_type):
+    return content_type in TABULAR_TYPES and os.path.getsize(file_path) > settings.stream_tabular_mb * 2**20
+
+
+def _load_file(file_path, content_type):
+    with span("ingest.parse", file=file_path, bytes=os.path.getsize(file_path)) as attrs:
+        documents = ReadFile(file_path).process(content_type)
+        attrs["documents"] = len(documents)
+    return documents
+
+
+def _load_pdf_pages(file_path, first_page, last_page):
+    with span("ingest.parse", file=file_path, pages=last_page - first_page) as attrs:
+        documents = ReadFile(file_path).read_pdf_pages(first_page, last_page)
+        attrs.update(documents=len(documents), bytes=sum(len(doc.page_content.encode("utf-8")) for doc in documents))
+    return documents
 
 
 class ReadFile:
@@ -15,8 +47,7 @@ class ReadFile:
             loader = TextLoader(self.fileLocation)
             document = loader.load()
         elif contentType == "application/pdf":
-            loader = PyPDFLoader(self.fileLocation)
-            document = loader.load_and_split()
+            document = self.read_pdf_pages()
         elif (
             contentType
             == "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
@@ -27,8 +58,8 @@ class ReadFile:
             contentType
             == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         ):
-            loader = UnstructuredExcelLoader(self.fileLocation)
-            document = loader.load()
+            # one document per row, like CSVLoader, and the same rows stream() yields for large workbooks
+            document = list(self._excel_rows())
         elif contentType == "text/csv":
             loader = CSVLoader(self.fileLocation)
             document = loader.load()
@@ -41,3 +72,117 @@ class ReadFile:
             doc.metadata["page"] = doc.metadata.get("page", 0)
                 
         return document
+
+    def read_pdf_pages(self, first_page=0, last_page=None):
+        # one document per page with text; process_many reads large PDFs in page ranges through this
+        # same function, so a PDF gets the same documents however it is read
+        reader = PdfReader(self.fileLocation)
+        total_pages = len(reader.pages)
+        documents = []
+        for page_number in range(first_page, total_pages if last_page is None else last_page):
+            text = reader.pages[page_number].extract_text() or ""
+            if text.strip():
+                documents.append(Document(
+                    page_content=text,
+                    metadata={"source": self.fileLocation, "page": page_number, "total_pages": total_pages},
+                ))
+        return documents
+
+    def stream(self, contentType, batch_rows=None):
+        # yields lists of at most batch_rows row documents, reading CSV lazily and XLSX through a
+        # read-only openpyxl workbook, so only one batch of a large table is in memory at a time
+        batch_rows = batch_rows or settings.stream_batch_rows
+        if contentType == "text/csv":
+            rows = CSVLoader(self.fileLocation).lazy_load()
+        elif contentType == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet":
+            rows = self._excel_rows()
+        else:
+            yield self.process(contentType)
+            return
+        while True:
+            batch = list(islice(rows, batch_rows))
+            if not batch:
+                return
+            for doc in batch:
+                doc.metadata["source"] = doc.metadata.get("source", self.fileLocation)
+                doc.metadata["page"] = doc.metadata.get("page", 0)
+            yield batch
+
+    def _excel_rows(self):
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(self.fileLocation, read_only=True, data_only=True)
+        try:
+            for page, sheet in enumerate(workbook.worksheets):
+                rows = sheet.iter_rows(values_only=True)
+                header = [str(name) if name is not None else "" for name in next(rows, None) or []]
+                for row_number, row in enumerate(rows):
+                    if all(value is None for value in row):
+                        continue
+                    # same "column: value" lines CSVLoader produces for a CSV row
+                    content = "\n".join(
+                        f"{header[i] if i < len(header) else i}: {'' if value is None else value}"
+                        for i, value in enumerate(row)
+                    )
+                    yield Document(
+                        page_content=content,
+                        metadata={"source": self.fileLocation, "sheet": sheet.title, "row": row_number, "page": page},
+                    )
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def process_many(files, max_workers=None, pages_per_task=25):
+        # files: iterable of (file_path, content_type). Parses them across a process pool and
+        # yields LoadedPart objects as soon as each file (or PDF page range) is ready; a file that
+        # fails yields a part with its error instead of aborting the others
+        tasks = []
+        streamed = []
+        for file_path, content_type in files:
+            if is_large_tabular(file_path, content_type):
+                streamed.append((file_path, content_type))
+                continue
+            page_count = 0
+            if content_type == "application/pdf":
+                try:
+                    page_count = len(PdfReader(file_path).pages)
+                except Exception as e:
+                    yield LoadedPart(file_path, 0, 1, [], e)
+                    continue
+            if page_count > pages_per_task:
+                ranges = [(first, min(first + pages_per_task, page_count)) for first in range(0, page_count, pages_per_task)]
+                for part, (first, last) in enumerate(ranges):
+                    tasks.append((file_path, part, len(ranges), _load_pdf_pages, (file_path, first, last)))
+            else:
+                tasks.append((file_path, 0, 1, _load_file, (file_path, content_type)))
+
+        if not tasks:
+            yield from _stream_parts(streamed)
+            return
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(func, *args): (file_path, part, total) for file_path, part, total, func, args in tasks}
+            # large tables are streamed here while the pool parses everything else
+            yield from _stream_parts(streamed)
+            for future in as_completed(futures):
+                file_path, part, total = futures[future]
+                try:
+                    yield LoadedPart(file_path, part, total, future.result())
+                except Exception as e:
+                    yield LoadedPart(file_path, part, total, [], e)
+
+
+def _stream_parts(files):
+    for file_path, content_type in files:
+        part = 0
+        try:
+            batches = ReadFile(file_path).stream(content_type)
+            current = next(batches, [])
+            # look one batch ahead so the last batch can be marked with the final part count
+            for upcoming in batches:
+                yield LoadedPart(file_path, part, None, current)
+                current = upcoming
+                part += 1
+        except Exception as e:
+            yield LoadedPart(file_path, part, part + 1, [], e)
+            continue
+        yield LoadedPart(file_path, part, part + 1, current)
@@ -0,0 +1,127 @@
+import re
+import numpy as np
+
+
+LANGUAGES = {
+    "english": "english", "arabic": "arabic", "french": "french", "spanish": "spanish",
+    "german": "german", "italian": "italian", "portuguese": "portuguese", "russian": "russian",
+    "chinese": "chinese (simplified)", "mandarin": "chinese (simplified)", "japanese": "japanese",
+    "korean": "korean", "hindi": "hindi", "urdu": "urdu", "turkish": "turkish", "persian": "persian",
+    "farsi": "persian", "dutch": "dutch", "greek": "greek", "hebrew": "hebrew", "bengali": "bengali",
+    "indonesian": "indonesian", "malay": "malay", "polish": "polish", "swedish": "swedish",
+    "ukrainian": "ukrainian", "vietnamese": "vietnamese", "thai": "thai", "punjabi": "punjabi",
+}
+
+_LANGUAGE_NAMES = "|".join(sorted(LANGUAGES, key=len, reverse=True))
+TARGET_LANGUAGE = re.compile(rf"\b(?:to|into|in)\s+({_LANGUAGE_NAMES})\b", re.IGNORECASE)
+ANY_LANGUAGE = re.compile(rf"\b({_LANGUAGE_NAMES})\b", re.IGNORECASE)
+
+_POLITE = r"^\s*(?:(?:please|kindly)\s+|(?:can|could|would|will)\s+you\s+(?:please\s+)?)?"
+_DOCUMENT = r"(?:(?:the|this|that|my|our|whole|entire|full|uploaded|attached)\s+)*(?:document|file|doc|pdf|report|paper|text|spreadsheet|sheet|it)"
+_SUMMARY = r"(?:(?:a|an|the)\s+)?(?:(?:short|brief|quick|concise)\s+)?(?:summary|overview|recap|rundown|gist|tl;?dr|key\s+points|main\s+points)"
+# summarization and translation start background jobs over the whole file, so only commands route to
+# them here; questions that merely mention a summary or a translation are left to the LLM classifier
+INTENT_PATTERNS = {
+    # "summarize the document", "give me a summary", "I need a short overview", "tl;dr"
+    "summarize": re.compile(
+        rf"{_POLITE}(?:summar(?:ise|ize)\b|tl;?dr\b"
+        rf"|(?:give|show|send|write|make|create|provide|get)\s+(?:(?:me|us)\s+)?{_SUMMARY}\b"
+        rf"|i\s+(?:want|need|would\s+like)\s+{_SUMMARY}\b)",
+        re.IGNORECASE,
+    ),
+    # "translate the document ...", "translate to french", "convert this file into arabic"
+    "translate": re.compile(
+        rf"{_POLITE}(?:translate\s+(?:{_DOCUMENT}\b|(?:to|into)\s+(?:{_LANGUAGE_NAMES})\b)"
+        rf"|convert\s+{_DOCUMENT}\s+(?:to|into)\s+(?:{_LANGUAGE_NAMES})\b)",
+        re.IGNORECASE,
+    ),
+}
+# any other mention ("what does the summary table show?", "how does the author translate this term?")
+# goes to the LLM classifier
+MENTIONS = {
+    "summarize": re.compile(r"\b(summar(y|ise|ize|ies|ising|izing)|tl;?dr|gist|overview|key points|main points|recap|in short)\b", re.IGNORECASE),
+    "translate": re.compile(r"\btranslat\w*", re.IGNORECASE),
+}
+QUESTION = re.compile(r"^\s*(what|who|whom|whose|when|where|why|how|which|is|are|was|were|do|does|did|can|could|should|explain|describe|list|define|tell me)\b|\?\s*$", re.IGNORECASE)
+
+# example utterances for the nearest-centroid fallback
+INTENT_EXAMPLES = {
+    "summarize": [
+        "summarize the document",
+        "give me a short overview of the paper",
+        "what are the main takeaways of this file",
+        "condense this report into a few paragraphs",
+        "brief me on the uploaded document",
+    ],
+    "translate": [
+        "translate the document to arabic",
+        "convert this file into french",
+        "I need this report in spanish",
+        "render the text in german",
+        "make an english version of the document",
+    ],
+    "qa": [
+        "what does the author say about the pyramid base",
+        "who wrote this study",
+        "how was the measurement performed",
+        "which materials are mentioned in the table",
+        "explain the method used in section two",
+    ],
+}
+
+
+def extract_target_language(query):
+    match = TARGET_LANGUAGE.search(query) or ANY_LANGUAGE.search(query)
+    return LANGUAGES[match.group(1).lower()] if match else None
+
+
+class IntentRouter:
+    # Resolves intent (and target language) locally: keyword rules first, then nearest centroid
+    # over cached embeddings. Returns intent None when neither is confident so the caller can ask the LLM
+    def __init__(self, embeddings=None, min_similarity=0.55, min_margin=0.05):
+        self.embeddings = embeddings
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self._centroids = None
+
+    def route(self, query):
+        intent = self.rule_intent(query)
+        if intent is None and self.embeddings is not None and not self._mentions_job(query):
+            intent = self.centroid_intent(query)
+        language = None
+        if intent == "translate":
+            # the LLM prompt this replaces assumed English when no language was named
+            language = extract_target_language(query) or "english"
+        return intent, language
+
+    @staticmethod
+    def _mentions_job(query, commanded=()):
+        return any(pattern.search(query) for intent, pattern in MENTIONS.items() if intent not in commanded)
+
+    def rule_intent(self, query):
+        matched = [intent for intent, pattern in INTENT_PATTERNS.items() if pattern.search(query)]
+        if self._mentions_job(query, matched):
+            return None
+        if len(matched) == 1:
+            return matched[0]
+        if not matched and QUESTION.search(query):
+            return "qa"
+        return None
+
+    def centroid_intent(self, query):
+        if self._centroids is None:
+            labels, centroids = [], []
+            for intent, examples in INTENT_EXAMPLES.items():
+                vectors = np.asarray(self.embeddings.embed_documents(examples), dtype=np.float32)
+                centroid = vectors.mean(axis=0)
+                labels.append(intent)
+                centroids.append(centroid / np.linalg.norm(centroid))
+            self._centroids = (labels, np.vstack(centroids))
+
+        labels, centroids = self._centroids
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        similarities = centroids @ (vector / np.linalg.norm(vector))
+        best, runner_up = np.argsort(similarities)[::-1][:2]
+        if similarities[best] >= self.min_similarity and similarities[best] - similarities[runner_up] >= self.min_margin:
+            return labels[best]
+        return None
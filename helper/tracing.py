@@ -0,0 +1,177 @@
+import argparse
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+import psutil
+from helper.config import settings
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_process = psutil.Process()
+
+
+def _rss_mb():
+    return _process.memory_info().rss / 2**20
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Tracer:
+    # Appends one JSON line per finished span. Spans nest through a context variable, so one chat turn
+    # becomes one trace whose children show where its time went (retrieval, prompt build, prefill, decode)
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def emit(self, record):
+        if not self.path:
+            return
+        line = json.dumps(record, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+@lru_cache(maxsize=None)
+def get_tracer():
+    return Tracer(settings.trace_path or None)
+
+
+def _new_record(name, start):
+    parent = _current_span.get()
+    return {
+        "name": name,
+        "trace_id": parent["trace_id"] if parent else uuid.uuid4().hex,
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": parent["span_id"] if parent else None,
+        "start": start,
+        "pid": os.getpid(),
+    }
+
+
+@contextmanager
+def span(name, **attrs):
+    # with span("retrieve", k=8) as attrs: attrs["hits"] = ...  -- attributes can be added until the block exits
+    record = _new_record(name, time.time())
+    attributes = dict(attrs)
+    token = _current_span.set(record)
+    rss_start = _rss_mb()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # a generator closed from another context; the span is still recorded
+            pass
+        rss = _rss_mb()
+        record.update(
+            duration_ms=round(duration_ms, 3),
+            rss_mb=round(rss, 1),
+            rss_delta_mb=round(rss - rss_start, 1),
+            peak_rss_mb=_peak_rss_mb(),
+            error=error,
+            attrs=attributes,
+        )
+        get_tracer().emit(record)
+
+
+def record_span(name, duration_ms, **attrs):
+    # for phases timed by hand, e.g. prefill (time to first token) inside a streamed response
+    record = _new_record(name, time.time() - duration_ms / 1000)
+    record.update(duration_ms=round(duration_ms, 3), rss_mb=round(_rss_mb(), 1), error=None, attrs=attrs)
+    get_tracer().emit(record)
+
+
+def traced(name):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def aggregate(path=None, since=None):
+    # p50/p95 latency per stage, plus token and memory totals where spans recorded them
+    path = path or settings.trace_path
+    stages = defaultdict(lambda: {"durations": [], "tokens": 0, "bytes": 0, "cache_hits": 0, "rss_mb": 0.0})
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if since is not None and record.get("start", 0) < since:
+                continue
+            stage = stages[record["name"]]
+            stage["durations"].append(record["duration_ms"])
+            attrs = record.get("attrs") or {}
+            stage["tokens"] += attrs.get("tokens") or 0
+            stage["bytes"] += attrs.get("bytes") or 0
+            stage["cache_hits"] += attrs.get("cache_hits") or 0
+            stage["rss_mb"] = max(stage["rss_mb"], record.get("rss_mb") or 0.0)
+
+    summary = {}
+    for name, stage in stages.items():
+        durations = stage.pop("durations")
+        summary[name] = {
+            "count": len(durations),
+            "p50_ms": round(_percentile(durations, 50), 1),
+            "p95_ms": round(_percentile(durations, 95), 1),
+            "total_ms": round(sum(durations), 1),
+            **stage,
+        }
+    return dict(sorted(summary.items(), key=lambda item: item[1]["total_ms"], reverse=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize recorded spans into p50/p95 latency per stage")
+    parser.add_argument("path", nargs="?", default=None, help="trace file (default: settings.trace_path)")
+    parser.add_argument("--last", type=float, default=None, help="only spans from the last N minutes")
+    args = parser.parse_args()
+
+    since = time.time() - args.last * 60 if args.last else None
+    summary = aggregate(args.path, since)
+    print(f"{'stage':<28} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'total ms':>11} {'tokens':>9} {'max RSS MB':>11}")
+    for name, stage in summary.items():
+        print(
+            f"{name:<28} {stage['count']:>6} {stage['p50_ms']:>10.1f} {stage['p95_ms']:>10.1f} "
+            f"{stage['total_ms']:>11.1f} {stage['tokens']:>9} {stage['rss_mb']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,212 @@
-import psutil
-from langchain_ollama import OllamaEmbeddings
+import hashlib
+import logging
+import threading
+import uuid
+from functools import lru_cache
 from langchain_community.vectorstores import Milvus
 # from pymilvus import connections
 from langchain_community.vectorstores import Qdrant
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as rest
+from helper.config import settings
+from helper.clients import get_ollama_embeddings
+from helper.embedding_cache import CachedEmbeddings, get_embedding_cache
+from helper.answer_cache import corpus_version, get_answer_cache
+from helper.lexical_index import BM25Index
+from helper.tracing import span
+from helper.index_pipeline import IndexingPipeline
+from langchain_core.documents import Document
+
+
+logger = logging.getLogger("DocumentAssistant")
+
+COLLECTION_NAME = "document_hub"
+DEFAULT_PERSIST_PATH = "data/qdrant"
+
+_write_locks = {}
+
+
+@lru_cache(maxsize=None)
+def get_qdrant_client(path):
+    # local Qdrant storage is locked per process, so every session shares one client per path
+    return QdrantClient(path=path)
+
+
+def source_filter(sources):
+    return rest.Filter(
+        must=[rest.FieldCondition(key="metadata.source", match=rest.MatchAny(any=list(sources)))]
+    )
+
+
+class ScopedQdrant(Qdrant):
+    # restricts searches on a shared collection to the documents of one session
+    def __init__(self, *args, sources=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sources = sorted(sources or [])
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        if filter is None and self.sources:
+            filter = source_filter(self.sources)
+        return super().similarity_search_with_score_by_vector(embedding, k=k, filter=filter, **kwargs)
+
 
 class Vectorstore:
 
-    def get_vectorstore(self, chunks, model_name = "nomic-embed-text:latest"):
+    def get_embeddings(self, model_name=None, cache=None):
+        model_name = model_name or settings.embedding_model
+        return CachedEmbeddings(get_ollama_embeddings(model_name), model_name, cache or get_embedding_cache())
+
+    @staticmethod
+    def chunk_id(doc):
+        # stable per-chunk ID: same source, page and text always map to the same point
+        content_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+        key = f"{doc.metadata.get('source')}:{doc.metadata.get('page', 0)}:{content_hash}"
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+    def get_vectorstore(self, chunks, model_name = None, cache=None, persist_path=None, backend=None):
         if not chunks:
             return None
-        embeddings = OllamaEmbeddings(
-            model=model_name,
-            num_thread=max(1, int(psutil.cpu_count() * 0.9)),
+        embeddings = self.get_embeddings(model_name, cache)
+        backend = backend or settings.vector_backend
+
+        ids = [self.chunk_id(doc) for doc in chunks]
+        with span("index.vectors", chunks=len(chunks), backend=backend, persistent=persist_path is not None):
+            if backend in ("compact", "numpy"):
+                vectorstore = self._compact(chunks, ids, embeddings, backend)
+            elif persist_path is None:
+                vectorstore = Qdrant.from_documents(
+                    documents=chunks,
+                    embedding=embeddings,
+                    ids=ids,
+                    collection_name=COLLECTION_NAME,
+                    location=":memory:",
+                    # connection_args={"host": "localhost", "port": "19530"},
+                )
+            else:
+                vectorstore = self._sync_persistent(chunks, embeddings, persist_path)
+        vectorstore.corpus_version = corpus_version(ids)
+        # lexical index over the same chunks, tagged with the same IDs the vector search returns
+        with span("index.lexical", chunks=len(chunks)):
+            vectorstore.lexical_index = BM25Index(
+                Document(page_content=doc.page_content, metadata={**doc.metadata, "_id": chunk_id})
+                for chunk_id, doc in dict(zip(ids, chunks)).items()
+            )
+
+        logger.info(f"Embedding cache | {embeddings.cache.stats()}")
+        return vectorstore
+
+    def start_pipeline(self, model_name=None, cache=None, persist_path=None, backend=None, **kwargs):
+        # incremental alternative to get_vectorstore: feed() chunks as files are parsed, then finish()
+        embeddings = self.get_embeddings(model_name, cache)
+        backend = backend or settings.vector_backend
+        client = vectorstore = None
+        if backend == "qdrant":
+            if persist_path is None:
+                client = QdrantClient(location=":memory:")
+                vectorstore = Qdrant(client=client, collection_name=COLLECTION_NAME, embeddings=embeddings)
+            else:
+                client = get_qdrant_client(persist_path)
+                vectorstore = ScopedQdrant(client=client, collection_name=COLLECTION_NAME, embeddings=embeddings)
+        return IndexingPipeline(
+            self,
+            embeddings,
+            backend,
+            client=client,
+            vectorstore=vectorstore,
+            collection_name=COLLECTION_NAME,
+            write_lock=_write_locks.setdefault(persist_path, threading.Lock()) if persist_path else None,
+            persistent=persist_path is not None and backend == "qdrant",
+            **kwargs,
+        )
+
+    def _compact(self, chunks, ids, embeddings, backend):
+        # per-session NumPy index instead of Qdrant; persist_path does not apply
+        from helper.compact_index import CompactVectorStore
+
+        unique = dict(zip(ids, chunks))
+        return CompactVectorStore.from_texts(
+            [doc.page_content for doc in unique.values()],
+            embeddings,
+            metadatas=[doc.metadata for doc in unique.values()],
+            ids=list(unique),
+            quantization=settings.compact_quantization if backend == "compact" else None,
+            rerank_factor=settings.compact_rerank_factor,
+            name=corpus_version(ids),
         )
 
-        vectorstore = Qdrant.from_documents(
-            documents=chunks,
-            embedding=embeddings,
-            collection_name="document_hub",
-            location=":memory:", 
-            # connection_args={"host": "localhost", "port": "19530"},
+    def _sync_persistent(self, chunks, embeddings, persist_path):
+        client = get_qdrant_client(persist_path)
+        sources = {doc.metadata.get("source") for doc in chunks}
+        vectorstore = ScopedQdrant(
+            client=client,
+            collection_name=COLLECTION_NAME,
+            embeddings=embeddings,
+            sources=sources,
+        )
+
+        wanted = {}
+        for doc in chunks:
+            wanted.setdefault(self.chunk_id(doc), doc)
+
+        with _write_locks.setdefault(persist_path, threading.Lock()):
+            existing = self.existing_ids(client, sources)
+            stale = existing - wanted.keys()
+            new_ids = [point_id for point_id in wanted if point_id not in existing]
+
+            if stale:
+                client.delete(
+                    collection_name=COLLECTION_NAME,
+                    points_selector=rest.PointIdsList(points=list(stale)),
+                )
+            if new_ids:
+                new_docs = [wanted[point_id] for point_id in new_ids]
+                self._ensure_collection(client, embeddings, new_docs[0].page_content)
+                vectorstore.add_texts(
+                    [doc.page_content for doc in new_docs],
+                    metadatas=[doc.metadata for doc in new_docs],
+                    ids=new_ids,
+                )
+
+        logger.info(
+            f"Qdrant sync | {persist_path}: {len(new_ids)} upserted, {len(stale)} deleted, "
+            f"{len(wanted) - len(new_ids)} unchanged"
         )
         return vectorstore
+
+    def _ensure_collection(self, client, embeddings, sample_text):
+        if client.collection_exists(COLLECTION_NAME):
+            return
+        dim = len(embeddings.embed_documents([sample_text])[0])
+        client.create_collection(
+            collection_name=COLLECTION_NAME,
+            vectors_config=rest.VectorParams(size=dim, distance=rest.Distance.COSINE),
+        )
+
+    def existing_ids(self, client, sources):
+        if not client.collection_exists(COLLECTION_NAME):
+            return set()
+        ids = set()
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=COLLECTION_NAME,
+                scroll_filter=source_filter(sources),
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.update(str(point.id) for point in points)
+            if offset is None:
+                return ids
+
+    def remove_documents(self, sources, persist_path=DEFAULT_PERSIST_PATH):
+        client = get_qdrant_client(persist_path)
+        if not client.collection_exists(COLLECTION_NAME):
+            return
+        with _write_locks.setdefault(persist_path, threading.Lock()):
+            client.delete(
+                collection_name=COLLECTION_NAME,
+                points_selector=rest.FilterSelector(filter=source_filter(sources)),
+            )
+        get_answer_cache().invalidate()
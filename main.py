@@ -1,15 +1,20 @@
 import os
+import re
+import hashlib
 import time
+import inspect
 import logging
-from openai import OpenAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from actions.translate import StructuredFileTranslator
-from langchain.callbacks import StreamingStdOutCallbackHandler
-from langchain.callbacks.manager import CallbackManager
-from langchain_ollama import ChatOllama
-import psutil
+import itertools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from helper.config import settings
+from helper.clients import get_openai_client, get_chat_ollama
+from helper.answer_cache import get_answer_cache
+from helper.lexical_index import HybridRetriever
+from helper.tracing import span, record_span
+# tiktoken, langchain chains, Qdrant and the file translators are imported inside the functions that
+# use them, so importing this module (and starting the Streamlit app) stays cheap
 
 
 
@@ -19,28 +24,53 @@ logger = logging.getLogger("DocumentAssistant")
 
 def track_tokens(task_name="LLM Task"):
     def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            # streaming tasks yield text pieces and return their token total once exhausted
+            def stream_wrapper(*args, **kwargs):
+                with span(task_name) as attrs:
+                    start = time.time()
+                    first_piece = None
+                    generator = func(*args, **kwargs)
+                    try:
+                        while True:
+                            try:
+                                piece = next(generator)
+                            except StopIteration as stop:
+                                total_tokens = stop.value
+                                break
+                            if first_piece is None:
+                                first_piece = time.time() - start
+                            yield piece
+                    finally:
+                        # a consumer that stops early (Streamlit rerun or stop) closes the task too
+                        generator.close()
+                    duration = time.time() - start or 1e-5
+                    attrs.update(tokens=total_tokens, ttft_ms=first_piece * 1000 if first_piece is not None else None)
+                ttft = f"{first_piece:.2f}s" if first_piece is not None else "N/A"
+                logger.info(f"{task_name} | Tokens: {total_tokens}, Time: {duration:.2f}s, TTFT: {ttft}, TPS: {total_tokens / duration if total_tokens else 'N/A'}")
+                return total_tokens
+            return stream_wrapper
+
         def wrapper(*args, **kwargs):
-            start = time.time()
-            result = func(*args, **kwargs)
-            output, total_tokens = result if isinstance(result, tuple) else (result, None)
+            with span(task_name) as attrs:
+                start = time.time()
+                result = func(*args, **kwargs)
+                output, total_tokens = result if isinstance(result, tuple) else (result, None)
+                attrs["tokens"] = total_tokens
             duration = time.time() - start or 1e-5
             logger.info(f"{task_name} | Tokens: {total_tokens}, Time: {duration:.2f}s, TPS: {total_tokens / duration if total_tokens else 'N/A'}")
             return result
         return wrapper
     return decorator
 
-# LLM Client
-llm = OpenAI(base_url="http://localhost:11434/v1", api_key="ollama")
-retriever_llm = ChatOllama(
-                base_url="http://localhost:11434",
-                model="llama3.2:3b",
-                verbose=True,
-                callback_manager=CallbackManager([StreamingStdOutCallbackHandler()]),
-                temperature=0.4,
-                num_ctx=512,
-                num_thread=max(1, int(psutil.cpu_count() * 0.9)),
-                stream=True,
-            )
+# LLM Clients: created on first use, not at import. main.llm and main.retriever_llm still resolve to the
+# shared OpenAI client and ChatOllama for code that imports them from this module
+def __getattr__(name):
+    if name == "llm":
+        return get_openai_client()
+    if name == "retriever_llm":
+        return get_chat_ollama()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Intent Detection
 @track_tokens("Intent Detection")
@@ -48,8 +78,8 @@ def detect_intent(query):
     system_prompt = "You are an intent detection assistant. Classify the user's intent as one of: " \
     "summarize: when user want for summarization , translate: when user want to translate the document, qa."
     user_prompt = f"Classify the following user query:\n\n{query}\n\nRespond with only one word: summarize, translate, or qa."
-    response = llm.chat.completions.create(
-        model="llama3.2:3b",
+    response = get_openai_client().chat.completions.create(
+        model=settings.chat_model,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
@@ -58,32 +88,193 @@ def detect_intent(query):
     content = response.choices[0].message.content.strip().lower()
     return content, response.usage.total_tokens
 
-@track_tokens("Summarization")
-def summarize(data):
-    summaries = []
-    for i, chunk in enumerate(data):
-        response = llm.chat.completions.create(
-            model="llama3.2:3b",
+SUMMARY_SYSTEM_PROMPT = "You are a helpful assistant that summarizes technical and academic content accurately."
+SUMMARY_MAX_WORKERS = 4
+# partial summaries are merged in groups that fit this many tokens of the model context
+SUMMARY_REDUCE_TOKENS = 1500
+SUMMARY_MAX_REDUCE_ROUNDS = 5
+SUMMARY_MODES = ("extractive", "full")
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    import tiktoken
+
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def _count_tokens(text):
+    return len(_encoding().encode(text))
+
+
+def _summary_call(user_prompt):
+    with span("summarize.llm_call") as attrs:
+        response = get_openai_client().chat.completions.create(
+            model=settings.chat_model,
             messages=[
-                {"role": "system", "content": "You are a helpful assistant that summarizes technical and academic content accurately."},
-                {"role": "user", "content": f"Summarize the following passage:\n\n{chunk}"}
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
             ]
         )
-        summaries.append(response.choices[0].message.content.strip())
+        attrs.update(tokens=response.usage.total_tokens, prompt_tokens=response.usage.prompt_tokens)
+    return response.choices[0].message.content.strip(), response.usage.total_tokens
+
+
+def _summarize_passage(text):
+    return _summary_call(f"Summarize the following passage:\n\n{text}")
+
+
+def _combine_summaries(summaries):
+    # a group of one could not be merged with its neighbours, so shrink it instead
+    if len(summaries) == 1:
+        return _summarize_passage(summaries[0])
+    joined = "\n\n".join(summaries)
+    return _summary_call(
+        "The following are summaries of consecutive parts of one document. "
+        f"Combine them into a single coherent summary, keeping the key facts:\n\n{joined}"
+    )
+
+
+def _group_by_budget(summaries, budget):
+    groups, current, current_tokens = [], [], 0
+    for summary in summaries:
+        tokens = _count_tokens(summary)
+        if current and current_tokens + tokens > budget:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _run_parallel(func, items, max_workers, on_done=None):
+    def run(item):
+        result = func(item)
+        if on_done is not None:
+            on_done()
+        return result
+
+    # pool.map keeps results in input order, so partial summaries stay in document order;
+    # if on_done raises (a cancelled job), work that has not started yet is dropped.
+    # Each task runs in a copy of the caller's context so its spans nest under the caller's span
+    contexts = [contextvars.copy_context() for _ in items]
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    try:
+        results = list(pool.map(lambda context, item: context.run(run, item), contexts, items))
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return [text for text, _ in results], sum(tokens or 0 for _, tokens in results)
+
+
+def _preselect(texts, budget, embeddings=None):
+    from actions.summary import select_representative
+    from helper.vector_store import Vectorstore
+
+    with span("summarize.preselect", chunks=len(texts), budget=budget) as attrs:
+        try:
+            # uploaded chunks were embedded when they were indexed, so these come from the embedding cache
+            vectors = (embeddings or Vectorstore().get_embeddings()).embed_documents(texts)
+        except Exception:
+            logger.exception("Summarization | could not embed chunks for pre-selection, summarizing all of them")
+            return texts
+        selected = select_representative(vectors, budget)
+        attrs["selected"] = len(selected)
+    logger.info(f"Summarization | {len(selected)} of {len(texts)} chunks selected")
+    return [texts[i] for i in selected]
+
+
+@track_tokens("Summarization")
+def summarize(data, max_workers=SUMMARY_MAX_WORKERS, reduce_tokens=SUMMARY_REDUCE_TOKENS, progress=None,
+              mode=None, budget=None, embeddings=None):
+    texts = [getattr(chunk, "page_content", chunk) for chunk in data]
+    if not texts:
+        return "", 0
+    mode = mode or settings.summary_mode
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"Unknown summary mode '{mode}', expected one of {SUMMARY_MODES}")
+    budget = budget or settings.summary_chunk_budget
+    # clustering pays off only when it drops most chunks; just above the budget every chunk is summarized
+    if mode == "extractive" and len(texts) >= 2 * budget:
+        texts = _preselect(texts, budget, embeddings)
+
+    def on_done(counter, total, message):
+        if progress is not None:
+            return lambda: progress(next(counter), total, message)
+
+    # map: summarize every chunk concurrently
+    summaries, total_tokens = _run_parallel(
+        _summarize_passage, texts, max_workers, on_done(itertools.count(1), len(texts), "Summarizing chunks")
+    )
+
+    # reduce: merge partial summaries hierarchically until one summary remains
+    for _ in range(SUMMARY_MAX_REDUCE_ROUNDS):
+        if len(summaries) == 1:
+            break
+        groups = _group_by_budget(summaries, reduce_tokens)
+        summaries, tokens = _run_parallel(
+            _combine_summaries, groups, max_workers, on_done(itertools.count(1), len(groups), "Merging summaries")
+        )
+        total_tokens += tokens
 
     final_summary = "\n\n".join(summaries)
     print("\n📝 FINAL SUMMARY:\n", final_summary)
-    return final_summary, response.usage.total_tokens
+    return final_summary, total_tokens
    
 
 @track_tokens("Translation")
-def translate(file_path, target_lang):
-    translator = StructuredFileTranslator(file_path=file_path, target_lang=target_lang)
+def translate(file_path, target_lang, progress=None):
+    from actions.translate import StructuredFileTranslator
+
+    translator = StructuredFileTranslator(file_path=file_path, target_lang=target_lang, progress=progress)
     translated_path = translator.translate()
     return f"✅ Translated file saved at: {translated_path}", None
 
+# Background jobs: the UI submits these instead of blocking its script thread for minutes
+def _summarize_job(payload, progress):
+    from langchain_core.documents import Document
+    from actions.summary import evaluate_summary
+
+    texts = payload["texts"]
+    metadata = payload.get("metadata") or [{} for _ in texts]
+    output, tokens = summarize(texts, progress=progress)
+    # the job already runs off the UI thread, and fast scoring takes milliseconds even for long documents
+    progress(1, 1, "Scoring summary")
+    # scored against every chunk of the document, not only the ones pre-selected for the LLM
+    scores = evaluate_summary(output, [Document(page_content=text, metadata=meta) for text, meta in zip(texts, metadata)])
+    return {"output": output, "tokens": tokens, "rouge": {key: round(val.fmeasure, 3) for key, val in scores.items()}}
+
+
+def _translate_job(payload, progress):
+    progress(0, 1, "Translating")
+    output, _ = translate(payload["file_path"], payload["target_lang"], progress=progress)
+    return {"output": output}
+
+
+@lru_cache(maxsize=None)
+def get_job_queue():
+    from helper.jobs import JobQueue
+
+    queue = JobQueue(max_workers=settings.job_workers)
+    queue.register("summarize", _summarize_job)
+    queue.register("translate", _translate_job)
+    return queue
+
+
+# token budgets for the QA prompt, so it stays bounded however long the chat gets
+QA_RETRIEVAL_K = 8
+# chunks used when nothing passes the similarity threshold or matches lexically
+QA_FALLBACK_K = 4
+QA_CONTEXT_TOKENS = 1500
+QA_HISTORY_TOKENS = 500
+QA_HISTORY_TURNS = 6
+
 # mantain conversation context
 def get_context_retriever_chain(vector_store):
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain.chains import create_history_aware_retriever
+
     retriever = vector_store.as_retriever()
 
     # Create a prompt
@@ -99,7 +290,7 @@ def get_context_retriever_chain(vector_store):
     )
 
     print("retriever_chain", prompt)
-    retriever_chain = create_history_aware_retriever(retriever_llm, retriever, prompt)
+    retriever_chain = create_history_aware_retriever(get_chat_ollama(), retriever, prompt)
 
     
 
@@ -108,6 +299,10 @@ def get_context_retriever_chain(vector_store):
 
 # get relevent data from vector store
 def get_conversational_rag_chain(retriever_chain):
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain.chains import create_retrieval_chain
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+
     prompt = ChatPromptTemplate.from_messages(
         [
             (
@@ -115,11 +310,11 @@ def get_conversational_rag_chain(retriever_chain):
                 "Answer the user's questions based on the below context:\n\n{context}",
             ),
             MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}"),llm
+            ("human", "{input}"),
         ]
     )
     print("stuff_documents_chain", prompt)
-    stuff_documents_chain = create_stuff_documents_chain(retriever_llm, prompt)
+    stuff_documents_chain = create_stuff_documents_chain(get_chat_ollama(), prompt)
     
 
     return create_retrieval_chain(retriever_chain, stuff_documents_chain)
@@ -140,30 +335,136 @@ def answer_question(vector_store, question , chat_history):
     #     content = chunk.get("answer", "")
     #     yield content
 
-    retriever = vector_store.as_retriever(
-        search_type="similarity_score_threshold",
-        search_kwargs={"score_threshold": 0.8}
+    docs_and_scores = _retrieve(vector_store, question)
+    cache_key = _answer_cache_key(vector_store, question, docs_and_scores, chat_history)
+    cached = _cached_answer(cache_key)
+    if cached is not None:
+        return cached, 0
+
+    prompt = _build_qa_prompt(question, docs_and_scores, chat_history)
+    with span("qa.generate") as attrs:
+        response = get_openai_client().chat.completions.create(
+            model=settings.chat_model,
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        attrs.update(tokens=response.usage.total_tokens, prompt_tokens=response.usage.prompt_tokens)
+    answer = response.choices[0].message.content.strip()
+    get_answer_cache().put(*cache_key, answer)
+    return answer, response.usage.total_tokens
+
+
+# same as answer_question, but yields the answer piece by piece as the model generates it
+@track_tokens("QA (RAG, streaming)")
+def answer_question_stream(vector_store, question, chat_history):
+    docs_and_scores = _retrieve(vector_store, question)
+    cache_key = _answer_cache_key(vector_store, question, docs_and_scores, chat_history)
+    cached = _cached_answer(cache_key)
+    if cached is not None:
+        yield cached
+        return 0
+
+    prompt = _build_qa_prompt(question, docs_and_scores, chat_history)
+    # prefill is timed up to the first token, decode from there to the end of the stream
+    start = time.perf_counter()
+    first_token = None
+    stream = get_openai_client().chat.completions.create(
+        model=settings.chat_model,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": prompt}
+        ],
+        stream=True,
+        stream_options={"include_usage": True},
     )
-    docs = retriever.invoke(question)
-    prompt = f"""Use the following Context and Chat History to answer the user's question.
+    total_tokens = None
+    usage = None
+    pieces = []
+    try:
+        for chunk in stream:
+            if chunk.usage is not None:
+                usage = chunk.usage
+                total_tokens = chunk.usage.total_tokens
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                pieces.append(chunk.choices[0].delta.content)
+                yield pieces[-1]
+    finally:
+        # frees the connection and its request slot even when the consumer abandons the stream
+        stream.close()
+    end = time.perf_counter()
+    if first_token is not None:
+        record_span("qa.prefill", (first_token - start) * 1000, prompt_tokens=usage.prompt_tokens if usage else None)
+        completion_tokens = usage.completion_tokens if usage else len(pieces)
+        record_span(
+            "qa.decode", (end - first_token) * 1000, tokens=total_tokens, completion_tokens=completion_tokens,
+            tokens_per_second=completion_tokens / (end - first_token) if end > first_token else None,
+        )
+    get_answer_cache().put(*cache_key, "".join(pieces).strip())
+    return total_tokens
+
+
+@lru_cache(maxsize=None)
+def _context_builder():
+    from helper.context_builder import ContextBuilder
+
+    return ContextBuilder(context_tokens=QA_CONTEXT_TOKENS, history_tokens=QA_HISTORY_TOKENS, history_turns=QA_HISTORY_TURNS)
+
+
+def _retrieve(vector_store, question):
+    lexical_index = getattr(vector_store, "lexical_index", None)
+    with span("qa.retrieve", hybrid=lexical_index is not None) as attrs:
+        if lexical_index is not None:
+            results = HybridRetriever(vector_store, lexical_index, score_threshold=0.8, fallback_k=QA_FALLBACK_K).search(question, k=QA_RETRIEVAL_K)
+        else:
+            results = vector_store.similarity_search_with_relevance_scores(
+                question, k=QA_RETRIEVAL_K, score_threshold=0.8
+            )
+        attrs["results"] = len(results)
+    return results
+
+
+def _cached_answer(cache_key):
+    with span("qa.answer_cache") as attrs:
+        cached = get_answer_cache().lookup(*cache_key)
+        attrs["cache_hits"] = int(cached is not None)
+    return cached
+
+
+def _answer_cache_key(vector_store, question, docs_and_scores, chat_history):
+    # the query embedding comes from the embedding cache, since retrieval just computed it. The cache is
+    # shared by every session, so the history the prompt will carry is part of the key: a follow-up such
+    # as "can you elaborate?" only reuses answers given after the same conversation
+    version = getattr(vector_store, "corpus_version", None)
+    vector = vector_store.embeddings.embed_query(question)
+    chunk_ids = [str(doc.metadata.get("_id")) for doc, _ in docs_and_scores]
+    history = hashlib.sha256(_context_builder().build_history(chat_history).encode("utf-8")).hexdigest()
+    return version, vector, chunk_ids, history
+
+
+def _build_qa_prompt(question, docs_and_scores, chat_history):
+    with span("qa.prompt_build", chunks=len(docs_and_scores)) as attrs:
+        prompt = _qa_prompt(question, docs_and_scores, chat_history)
+        attrs["bytes"] = len(prompt.encode("utf-8"))
+    return prompt
+
+
+def _qa_prompt(question, docs_and_scores, chat_history):
+    builder = _context_builder()
+    return f"""Use the following Context and Chat History to answer the user's question.
 
     Context:
-    {docs}
+    {builder.build_context(docs_and_scores)}
 
     Chat History:
-    {chat_history}
+    {builder.build_history(chat_history)}
 
     Question: {question}
 
     Answer:"""
-    response = llm.chat.completions.create(
-        model="llama3.2:3b",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    return response.choices[0].message.content.strip(), response.usage.total_tokens
 
 def extract_language(query):
     prompt = f"""
@@ -175,12 +476,61 @@ def extract_language(query):
 
         Respond with only the name of the target language in lowercase (e.g., "english", "arabic").
     """
-    response = llm.chat.completions.create(
-        model="llama3.2:3b",
+    response = get_openai_client().chat.completions.create(
+        model=settings.chat_model,
         messages=[{"role": "user", "content": prompt}],
     )
     return response.choices[0].message.content.strip().lower()
 
+@track_tokens("Intent + Language Detection")
+def detect_intent_and_language(query):
+    # single LLM call used when the local router is not confident
+    system_prompt = "You are an intent detection assistant. Classify the user's intent as one of: " \
+    "summarize: when user want for summarization , translate: when user want to translate the document, qa."
+    user_prompt = f"""Classify the following user query and, if it asks for a translation, extract the language the document should be translated **into**.
+        If no language is specified, assume English.
+
+        Query: "{query}"
+
+        Respond with exactly one line in the form: intent=<summarize|translate|qa>; language=<target language in lowercase>"""
+    response = get_openai_client().chat.completions.create(
+        model=settings.chat_model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    )
+    content = response.choices[0].message.content.strip().lower()
+    intent = re.search(r"intent\s*=\s*(summarize|translate|qa)", content)
+    language = re.search(r"language\s*=\s*([a-z ()]+)", content)
+    intent = intent.group(1) if intent else next((name for name in ("summarize", "translate", "qa") if name in content), content)
+    language = language.group(1).strip() if language else "english"
+    return (intent, language), response.usage.total_tokens
+
+
+@lru_cache(maxsize=None)
+def _router():
+    from helper.router import IntentRouter
+    from helper.vector_store import Vectorstore
+
+    return IntentRouter(Vectorstore().get_embeddings())
+
+
+def route_query(query):
+    # returns (intent, target language); the LLM is only consulted for ambiguous queries
+    start = time.time()
+    try:
+        intent, language = _router().route(query)
+    except Exception as e:
+        logger.warning(f"Local intent routing failed ({e}), falling back to the LLM")
+        intent, language = None, None
+    if intent is None:
+        (intent, language), _ = detect_intent_and_language(query)
+    else:
+        logger.info(f"Intent Routing | local: {intent}, Time: {(time.time() - start) * 1000:.2f}ms")
+    return intent, language
+
+
 def detect_file_type(file_path):
     ext = os.path.splitext(file_path)[-1].lower()
     return {